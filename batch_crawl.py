@@ -0,0 +1,310 @@
+"""
+Пакетный обход союзов и профилей без Streamlit — для ночных отчётов по лиге.
+
+Для каждого URL союза выгружаются все участники (для профиля — одна строка):
+победы, ничьи и поражения за окно дат и, если не указан --no-roster,
+"Сила 11 лучших" и GK. Результат пишется в Parquet (или в CSV, если нет
+pyarrow/fastparquet либо выходной файл .csv).
+
+Каждый обойдённый URL сразу сохраняется в каталог <out>.parts, поэтому
+прерванный запуск с теми же аргументами продолжает с необойдённых URL;
+истории матчей уже обойдённых игроков берутся из локальной базы MatchStore.
+
+Запуск из корня проекта:
+    python batch_crawl.py https://11x11.ru/guilds/139 https://11x11.ru/guilds/200 \\
+        --from "01.06.2024 00:00" --to "01.06.2024 23:59" --out reports/league.parquet
+    python batch_crawl.py --urls-file guilds.txt --out reports/league.parquet --no-roster
+
+С --workers N участники всех союзов делятся по user_id между N процессами,
+у каждого — свой Chromium, HTTP-сессия и лимит запросов; координатор собирает
+их строки. Рядом с выходным файлом пишется <out>_guilds с числом игравших и
+не игравших участников по каждому URL.
+
+    python batch_crawl.py --urls-file league.txt --workers 4 --out reports/league.parquet
+
+Логин и пароль берутся из --login/--password или переменных GLEB_LOGIN/GLEB_PASSWORD.
+"""
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import os
+import sys
+from contextlib import aclosing
+from datetime import datetime
+
+import pandas as pd
+
+from utils import metrics, sharding
+from utils.browser_pool import BROWSER_POOL
+from utils.data_processing import async_iter_completed, async_iter_results, profile_failed
+from utils.http_client import create_http_session
+from utils.match_store import MatchStore
+from utils.profiles import async_get_profile_stats_info
+from utils.scheduler import MAX_LIMIT, MIN_LIMIT, CrawlScheduler, use_scheduler
+
+COLUMNS = ["target_url", "profile_url", "nickname", "wins", "draws", "losses", "power", "gk",
+           "filter_from", "filter_to"]
+# Сколько URL из списка обходить одновременно; темп запросов внутри задаёт CrawlScheduler
+TARGET_CONCURRENCY = 2
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+
+
+def target_mode(target_url):
+    """Режим async_iter_results для URL: союз или отдельный профиль."""
+    return "Союзу" if "/guilds/" in target_url else "Профилю"
+
+
+def parquet_available():
+    return any(importlib.util.find_spec(engine) is not None for engine in ("pyarrow", "fastparquet"))
+
+
+def output_format(out_path):
+    """"parquet" или "csv" — по расширению out_path и наличию движка Parquet."""
+    if out_path.endswith(".csv"):
+        return "csv"
+    if not parquet_available():
+        print("pyarrow/fastparquet не установлены — результат будет записан в CSV")
+        return "csv"
+    return "parquet"
+
+
+def write_frame(df, path, fmt):
+    """Атомарно записывает таблицу: прерванная запись не оставляет битый файл."""
+    tmp_path = f"{path}.tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_frame(path, fmt):
+    return pd.read_parquet(path) if fmt == "parquet" else pd.read_csv(path)
+
+
+def part_path(parts_dir, target_url, filter_from, filter_to, with_roster, fmt):
+    """Файл частичного результата для URL; имя зависит и от окна дат, и от состава колонок."""
+    key = f"{target_url}|{filter_from:%Y%m%d%H%M}|{filter_to:%Y%m%d%H%M}|{int(with_roster)}"
+    return os.path.join(parts_dir, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.{fmt}")
+
+
+async def async_crawl_target(session, context, store, target_url, filter_from, filter_to, with_roster):
+    """
+    Обходит один URL (союз или профиль) и возвращает строки с колонками COLUMNS.
+    Если статистику хотя бы одного игрока собрать не удалось или у союза не
+    нашлось ни одного участника (список не загрузился), URL считается
+    необойдённым (RuntimeError): неполные итоги союза в отчёт не попадают, и
+    повторный запуск обойдёт его снова.
+    """
+    results = []
+    async with aclosing(async_iter_results(session, None, target_mode(target_url), target_url,
+                                           filter_from, filter_to, session, store)) as items:
+        async for _, _, result in items:
+            if result is not None:
+                results.append(result)
+    if not results and target_mode(target_url) == "Союзу":
+        raise RuntimeError("список участников союза пуст или не загрузился")
+    failed = sum(1 for result in results if profile_failed(result))
+    if failed:
+        raise RuntimeError(f"не удалось собрать статистику {failed} из {len(results)} игроков")
+
+    infos = {}
+    if with_roster and results:
+        async def member_info(profile_url):
+            return profile_url, await async_get_profile_stats_info(context, profile_url)
+        async with aclosing(async_iter_completed(member_info(result[0]) for result in results)) as completed:
+            async for profile_url, info in completed:
+                infos[profile_url] = info
+
+    rows = []
+    for profile_url, nickname, wins, draws, losses in results:
+        info = infos.get(profile_url)
+        rows.append({
+            "target_url": target_url,
+            "profile_url": profile_url,
+            "nickname": nickname,
+            "wins": wins,
+            "draws": draws,
+            "losses": losses,
+            "power": info.power if info else None,
+            "gk": info.gk if info else None,
+            "filter_from": filter_from,
+            "filter_to": filter_to,
+        })
+    return rows
+
+
+def plan_batch(targets, filter_from, filter_to, out_path, with_roster):
+    """
+    Определяет формат и путь вывода, файлы частичных результатов по URL и список
+    ещё не обойдённых URL. Возвращает (fmt, out_path, parts, pending).
+    """
+    fmt = output_format(out_path)
+    if fmt == "csv" and not out_path.endswith(".csv"):
+        out_path = os.path.splitext(out_path)[0] + ".csv"
+    parts_dir = f"{out_path}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    parts = {target_url: part_path(parts_dir, target_url, filter_from, filter_to, with_roster, fmt)
+             for target_url in targets}
+    pending = [target_url for target_url in targets if not os.path.exists(parts[target_url])]
+    print(f"URL всего: {len(targets)}, уже обойдено: {len(targets) - len(pending)}, осталось: {len(pending)}")
+    return fmt, out_path, parts, pending
+
+
+def guild_summary(report):
+    """Итог по каждому URL: всего участников, играли и не играли в окне дат."""
+    played = (report["wins"] + report["draws"] + report["losses"]) > 0
+    summary = report.assign(active_count=played, inactive_count=~played).groupby("target_url", sort=False).agg(
+        total_players=("profile_url", "count"), active_count=("active_count", "sum"),
+        inactive_count=("inactive_count", "sum"))
+    return summary.reset_index()
+
+
+def write_report(targets, parts, fmt, out_path):
+    """Собирает файлы обойдённых URL в out_path и пишет рядом итог по союзам (<out>_guilds)."""
+    done_parts = [parts[target_url] for target_url in targets if os.path.exists(parts[target_url])]
+    frames = [read_frame(path, fmt) for path in done_parts]
+    report = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    write_frame(report, out_path, fmt)
+    stem, ext = os.path.splitext(out_path)
+    summary = guild_summary(report)
+    write_frame(summary, f"{stem}_guilds{ext}", fmt)
+    print(f"Записано {len(report)} строк в {out_path}")
+    for target_url, total, active, inactive in summary.itertuples(index=False):
+        print(f"{target_url}: всего игроков {total}, играли {active}, не играли {inactive}")
+
+
+async def async_run_batch(targets, filter_from, filter_to, login, password, out_path,
+                          with_roster=True, target_concurrency=TARGET_CONCURRENCY, max_requests=MAX_LIMIT,
+                          metrics_path=metrics.METRICS_LOG):
+    """
+    Обходит targets в одном процессе (не более target_concurrency одновременно,
+    у каждого URL свой CrawlScheduler и бюджет повторов; вместе не больше
+    max_requests запросов), пропуская URL, уже сохранённые в <out>.parts, и
+    собирает итоговый файл. URL, у которого не удалось дочитать историю хотя бы
+    одного игрока, считается необойдённым и в <out>.parts не пишется. Метрики
+    обхода (со временем каждого URL как target:<url>) дописываются в metrics_path.
+    Возвращает список URL, обход которых не удался.
+    """
+    fmt, out_path, parts, pending = plan_batch(targets, filter_from, filter_to, out_path, with_roster)
+    failed = []
+    if pending:
+        login_session = await BROWSER_POOL.acquire(login, password)
+        context = login_session.context
+        limit = asyncio.Semaphore(target_concurrency)
+        target_requests = max(1, max_requests // target_concurrency)
+
+        async def crawl(target_url):
+            # Свой планировщик на URL: ошибки одного союза не исчерпывают повторы остальных
+            scheduler = CrawlScheduler(min_limit=min(MIN_LIMIT, target_requests), max_limit=target_requests)
+            async with limit:
+                try:
+                    with metrics.timed(f"target:{target_url}"), use_scheduler(scheduler):
+                        rows = await async_crawl_target(session, context, store, target_url,
+                                                        filter_from, filter_to, with_roster)
+                except Exception as e:
+                    print(f"Failed to crawl {target_url}: {e}")
+                    failed.append(target_url)
+                    return
+                write_frame(pd.DataFrame(rows, columns=COLUMNS), parts[target_url], fmt)
+                print(f"{target_url}: {len(rows)} строк")
+
+        crawl_metrics = metrics.CrawlMetrics(f"batch {len(pending)} URL")
+        with MatchStore() as store, metrics.use_metrics(crawl_metrics):
+            async with await create_http_session(context, login_session.user_agent) as session:
+                await asyncio.gather(*(crawl(target_url) for target_url in pending))
+        crawl_metrics.finish()
+        crawl_metrics.export(metrics_path)
+
+    write_report(targets, parts, fmt, out_path)
+    return failed
+
+
+def run_sharded_batch(targets, filter_from, filter_to, login, password, out_path, workers,
+                      with_roster=True, max_requests=MAX_LIMIT, metrics_path=metrics.METRICS_LOG):
+    """
+    То же, что async_run_batch, но участники всех ещё не обойдённых URL делятся
+    по user_id между workers процессами (utils.sharding), у каждого из которых свой
+    браузер, HTTP-сессия и бюджет запросов max_requests. URL записывается в
+    <out>.parts, только если обойдены все его участники. Метрики всех шардов
+    сливаются и дописываются в metrics_path одной записью.
+    """
+    fmt, out_path, parts, pending = plan_batch(targets, filter_from, filter_to, out_path, with_roster)
+    failed = set()
+    if pending:
+        members, discovery_failed = asyncio.run(sharding.async_discover_members(pending, login, password))
+        print(f"Участников к обходу: {len(members)}, процессов: {workers}")
+        crawl_metrics = metrics.CrawlMetrics(f"batch {len(pending)} URL, {workers} processes")
+        rows, failed = sharding.run_shards(members, workers, filter_from, filter_to, login, password,
+                                           with_roster, max_requests, crawl_metrics)
+        failed.update(discovery_failed)
+        crawl_metrics.finish()
+        crawl_metrics.export(metrics_path)
+        by_target = {target_url: [] for target_url in pending}
+        for row in rows:
+            by_target[row[0]].append(row)
+        for target_url, target_rows in by_target.items():
+            if target_url in failed:
+                print(f"Failed to crawl {target_url}: не все участники обойдены")
+                continue
+            df = pd.DataFrame(target_rows, columns=COLUMNS[:-2]).assign(filter_from=filter_from, filter_to=filter_to)
+            write_frame(df[COLUMNS], parts[target_url], fmt)
+            print(f"{target_url}: {len(target_rows)} строк")
+
+    write_report(targets, parts, fmt, out_path)
+    return sorted(failed)
+
+
+def read_targets(args):
+    targets = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file, encoding="utf-8") as f:
+            targets.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    # Повторы в списке не обходим дважды, порядок сохраняем
+    return list(dict.fromkeys(targets))
+
+
+def main():
+    today = datetime.now().strftime("%d.%m.%Y")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("urls", nargs="*", help="URL союзов (/guilds/...) или профилей (/users/...)")
+    parser.add_argument("--urls-file", help="файл со списком URL, по одному на строку")
+    parser.add_argument("--from", dest="filter_from", default=f"{today} 00:00", help="начало окна, ДД.ММ.ГГГГ ЧЧ:ММ")
+    parser.add_argument("--to", dest="filter_to", default=f"{today} 23:59", help="конец окна, ДД.ММ.ГГГГ ЧЧ:ММ")
+    parser.add_argument("--out", default="report.parquet", help="выходной файл (.parquet или .csv)")
+    parser.add_argument("--no-roster", action="store_true", help="не собирать \"Сила 11 лучших\" и GK")
+    parser.add_argument("--targets", type=int, default=TARGET_CONCURRENCY, help="сколько URL обходить одновременно")
+    parser.add_argument("--max-requests", type=int, default=MAX_LIMIT,
+                        help="потолок одновременных запросов (в каждом процессе)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="число процессов; при >1 участники делятся между процессами по user_id")
+    parser.add_argument("--metrics", default=metrics.METRICS_LOG, help="файл JSONL для метрик обхода")
+    parser.add_argument("--login", default=os.environ.get("GLEB_LOGIN"))
+    parser.add_argument("--password", default=os.environ.get("GLEB_PASSWORD"))
+    args = parser.parse_args()
+
+    targets = read_targets(args)
+    if not targets:
+        parser.error("не указано ни одного URL")
+    if not args.login or not args.password:
+        parser.error("нужны --login и --password (или GLEB_LOGIN и GLEB_PASSWORD)")
+    filter_from = datetime.strptime(args.filter_from, DATE_FORMAT)
+    filter_to = datetime.strptime(args.filter_to, DATE_FORMAT)
+
+    if args.workers > 1:
+        failed = run_sharded_batch(targets, filter_from, filter_to, args.login, args.password, args.out,
+                                   args.workers, not args.no_roster, args.max_requests, args.metrics)
+    else:
+        failed = asyncio.run(async_run_batch(targets, filter_from, filter_to, args.login, args.password, args.out,
+                                             not args.no_roster, args.targets, args.max_requests, args.metrics))
+    if failed:
+        print(f"Не удалось обойти {len(failed)} URL; повторный запуск продолжит с них")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
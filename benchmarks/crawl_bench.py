@@ -0,0 +1,131 @@
+"""
+Бенчмарк обхода против локального стенда (benchmarks.stand_server) — без 11x11.ru.
+
+Для союзов из 10, 100 и 1000 участников запускаются async_main (статистика
+матчей за окно дат) и async_get_roster (сила и GK), каждый прогон — в отдельном
+процессе с чистой базой MatchStore и GLEB_BASE_URL, указывающим на стенд.
+Отчёт: время прогона, страниц в секунду, запросов и повторов (ответов 503,
+внедрённых стендом), переданный объём и пиковый RSS процесса Python
+(процессы Chromium и пула разбора в него не входят).
+
+Запуск из корня проекта:
+    python -m benchmarks.crawl_bench
+    python -m benchmarks.crawl_bench --sizes 10 100 --latency 0.05 --error-rate 0.02
+    python -m benchmarks.crawl_bench --no-browser   # без Chromium: только статистика по HTTP
+
+С --no-browser вход и браузер не используются: статистика собирается
+async_collect_results через HTTP-сессию с cookie стенда, ростер пропускается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.stand_server import AUTH_COOKIE, Stand, StandThread
+
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+SCENARIOS = ("stats", "roster")
+
+
+async def _async_run_scenario(scenario, guild_url, filter_from, filter_to, no_browser):
+    """Выполняется в дочернем процессе; возвращает число строк результата."""
+    if scenario == "roster":
+        from utils.roster import async_get_roster
+        _, roster = await async_get_roster(guild_url, "bench", "bench")
+        return len(roster)
+    if no_browser:
+        import aiohttp
+        from utils.data_processing import async_collect_results
+        from utils.match_store import MatchStore
+        from utils.scheduler import CrawlScheduler, use_scheduler
+        with MatchStore() as store, use_scheduler(CrawlScheduler()):
+            async with aiohttp.ClientSession(cookies={AUTH_COOKIE: "1"}) as session:
+                rows = await async_collect_results(session, None, "Союзу", guild_url, filter_from, filter_to, session, store)
+        return len(rows)
+    from utils.data_processing import async_main
+    rows = await async_main("Союзу", guild_url, filter_from, filter_to, "bench", "bench")
+    return len(rows)
+
+
+def run_child(args):
+    """Дочерний режим: один прогон, результат — строка JSON в stdout."""
+    filter_from = datetime.strptime(args.filter_from, DATE_FORMAT)
+    filter_to = datetime.strptime(args.filter_to, DATE_FORMAT)
+    started = time.perf_counter()
+    rows = asyncio.run(_async_run_scenario(args.scenario, args.guild_url, filter_from, filter_to, args.no_browser))
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"rows": rows, "elapsed": elapsed, "peak_rss_kb": peak_kb}))
+
+
+def run_scenario(stand_thread, scenario, size, args):
+    """Запускает прогон в дочернем процессе и дополняет его результат счётчиками стенда."""
+    stats = stand_thread.stand.stats
+    stats.reset()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   GLEB_BASE_URL=stand_thread.base_url,
+                   GLEB_DB_PATH=os.path.join(tmp, "matches.sqlite3"),
+                   GLEB_STATE_DIR=tmp)
+        command = [sys.executable, "-m", "benchmarks.crawl_bench", "--child", "--scenario", scenario,
+                   "--guild-url", f"{stand_thread.base_url}/guilds/{size}",
+                   "--from", args.filter_from, "--to", args.filter_to]
+        if args.no_browser:
+            command.append("--no-browser")
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if "Error" in line]
+        print(errors[-1] if errors else f"код возврата {completed.returncode}")
+        return None
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result.update(requests=stats.requests, pages=stats.pages, retries=stats.errors, bytes=stats.bytes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="размеры союзов")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.02, help="средняя задержка ответа стенда, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--matches", type=int, default=100, help="матчей в истории каждого игрока")
+    parser.add_argument("--from", dest="filter_from", default="25.05.2024 00:00")
+    parser.add_argument("--to", dest="filter_to", default="01.06.2024 23:59")
+    parser.add_argument("--no-browser", action="store_true", help="без Chromium: статистика через HTTP, без ростера")
+    # Внутренние аргументы дочернего процесса
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--guild-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    scenarios = [s for s in args.scenarios if not (args.no_browser and s == "roster")]
+    stand_thread = StandThread(Stand(args.latency, args.error_rate, args.matches)).start()
+    print(f"Стенд: {stand_thread.base_url}, задержка {args.latency} с, ошибок {args.error_rate:.0%}")
+    print(f"{'сценарий':<10}{'игроков':>8}{'строк':>8}{'время, с':>10}{'стр/с':>9}"
+          f"{'запросов':>10}{'повторов':>10}{'МБ':>8}{'RSS, МБ':>9}")
+    try:
+        for scenario in scenarios:
+            for size in args.sizes:
+                result = run_scenario(stand_thread, scenario, size, args)
+                if result is None:
+                    print(f"{scenario:<10}{size:>8}  прогон не удался")
+                    continue
+                print(f"{scenario:<10}{size:>8}{result['rows']:>8}{result['elapsed']:>10.2f}"
+                      f"{result['pages'] / result['elapsed']:>9.1f}{result['requests']:>10}{result['retries']:>10}"
+                      f"{result['bytes'] / 2 ** 20:>8.1f}{result['peak_rss_kb'] / 1024:>9.1f}")
+    finally:
+        stand_thread.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Синтетические страницы 11x11.ru для бенчмарков: история матчей, список
+участников союза и профиль с таблицей игроков. Разметка повторяет то, что
+читают парсеры utils/, и обвешана типичной «обвязкой» сайта (меню, подвал),
+чтобы объём страниц был близок к настоящим.
+"""
+import random
+from datetime import datetime, timedelta
+
+HISTORY_PAGE_SIZE = 20
+MEMBERS_PAGE_SIZE = 50
+
+_CHROME_LINKS = "".join(f'<li><a href="/section/{i}">Раздел {i}</a></li>' for i in range(60))
+_CHROME_HEAD = (
+    '<html><head><meta charset="utf-8"><title>{title}</title>'
+    '<link rel="stylesheet" href="/css/main.css"><script src="/js/main.js"></script></head>'
+    f'<body><div id="menu"><ul>{_CHROME_LINKS}</ul></div><div id="content">'
+)
+_CHROME_FOOT = '</div><div id="footer">' + "<p>11x11 — футбольный менеджер</p>" * 20 + "</div></body></html>"
+
+
+def make_matches(user_id, count, newest=datetime(2024, 6, 1, 12, 0), seed=0):
+    """Список матчей игрока от новых к старым: (дата, результат "Win"/"Draw"/"Loss", id соперника)."""
+    rng = random.Random(f"{user_id}:{seed}")
+    matches = []
+    played_at = newest
+    for _ in range(count):
+        matches.append((played_at, rng.choice(("Win", "Draw", "Loss")), str(rng.randint(1000, 9999999))))
+        played_at -= timedelta(minutes=rng.randint(30, 60 * 24))
+    return matches
+
+
+def history_page(user_id, matches, page_num, page_size=HISTORY_PAGE_SIZE):
+    """Страница history.php; за концом истории — страница без строк матчей."""
+    rows = []
+    for played_at, result, opponent_id in matches[(page_num - 1) * page_size:page_num * page_size]:
+        me = f'<a href="/users/{user_id}">Игрок {user_id}</a>'
+        them = f'<a href="/users/{opponent_id}">Игрок {opponent_id}</a>'
+        if result == "Win":
+            center = f'<b><a href="/users/{user_id}">2:1</a></b>'
+        elif result == "Loss":
+            center = f'<b><a href="/users/{opponent_id}">1:2</a></b>'
+        else:
+            center = "1:1"
+        rows.append(
+            f"<tr><td>{played_at:%d.%m.%Y %H:%M}</td><td>{me}</td><td>{center}</td>"
+            f"<td>{them}</td><td><a href=\"/games/{random.randint(1, 10**7)}\">отчёт</a></td></tr>"
+        )
+    return (
+        _CHROME_HEAD.format(title="История матчей")
+        + "<table class=\"history\">" + "".join(rows) + "</table>"
+        + _CHROME_FOOT
+    )
+
+
+def members_page(member_ids, page_num, page_size=MEMBERS_PAGE_SIZE):
+    """Страница guilds.php?act=members с пагинацией."""
+    last_page = max(1, (len(member_ids) + page_size - 1) // page_size)
+    chunk = member_ids[(page_num - 1) * page_size:page_num * page_size]
+    rows = "".join(
+        f'<tr><td>{i + 1}</td><td><a href="/users/{uid}">Игрок {uid}</a></td><td>{random.randint(1, 99)}</td></tr>'
+        for i, uid in enumerate(chunk)
+    )
+    pagination = " ".join(f'<a href="?page={n}">{n}</a>' for n in range(1, last_page + 1))
+    return (
+        _CHROME_HEAD.format(title="Участники союза")
+        + f"<table>{rows}</table><div class=\"pages\">{pagination}</div>"
+        + _CHROME_FOOT
+    )
+
+
+def profile_page(user_id, seed=0, players=30):
+    """Страница профиля с "Сила 11 лучших" и таблицей игроков (вратари первыми)."""
+    rng = random.Random(f"profile:{user_id}:{seed}")
+    positions = ["Gk"] * 3 + [rng.choice(("Cd", "Ld", "Rd", "Cm", "Lm", "Rm", "Cf")) for _ in range(players - 3)]
+    rows = "".join(
+        f"<tr><td>{pos}</td><td>Игрок {n}</td><td>{rng.randint(17, 35)}</td><td>{rng.randint(40, 99)}</td></tr>"
+        for n, pos in enumerate(positions)
+    )
+    return (
+        _CHROME_HEAD.format(title=f"Профиль участника Игрок {user_id} - 11x11")
+        + f"<table><tr><td>Сила 11 лучших</td><td>{rng.randint(500, 1500)}</td></tr></table>"
+        + "<h3>Игроки команды</h3>"
+        + f"<table><tr><th>Поз</th><th>Имя</th><th>Воз</th><th>Мас</th></tr>{rows}</table>"
+        + _CHROME_FOOT
+    )
@@ -0,0 +1,117 @@
+"""
+Микробенчмарк парсеров: строк в секунду и пиковая память для бэкендов
+"bs4" (BeautifulSoup + html.parser, прежний код) и "lxml".
+
+Запуск из корня проекта:
+    python -m benchmarks.parse_bench
+    python -m benchmarks.parse_bench --pages-dir saved_pages --repeat 20
+
+В --pages-dir ожидаются сохранённые страницы history_<user_id>_*.html,
+members_*.html и profile_*.html; без него используются синтетические
+страницы из benchmarks.fixtures.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import tracemalloc
+
+from benchmarks import fixtures
+from utils import parsing
+from utils.profiles import parse_profile_page
+
+
+def load_pages(pages_dir):
+    """Возвращает {"history": [(html, user_id)], "members": [html], "profile": [html]}."""
+    pages = {"history": [], "members": [], "profile": []}
+    if pages_dir:
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            name = os.path.basename(path)
+            with open(path, encoding="utf-8", errors="replace") as f:
+                html = f.read()
+            if name.startswith("history_"):
+                user_id = re.match(r"history_(\d+)", name)
+                pages["history"].append((html, user_id.group(1) if user_id else ""))
+            elif name.startswith("members_"):
+                pages["members"].append(html)
+            elif name.startswith("profile_"):
+                pages["profile"].append(html)
+        return pages
+
+    for user_id in range(100, 110):
+        matches = fixtures.make_matches(str(user_id), fixtures.HISTORY_PAGE_SIZE * 5)
+        for page_num in range(1, 6):
+            pages["history"].append((fixtures.history_page(str(user_id), matches, page_num), str(user_id)))
+    member_ids = [str(i) for i in range(1000, 1500)]
+    pages["members"] = [fixtures.members_page(member_ids, n) for n in range(1, 11)]
+    pages["profile"] = [fixtures.profile_page(str(i)) for i in range(20)]
+    return pages
+
+
+def measure(func, inputs, repeat):
+    """Прогоняет func по inputs repeat раз; возвращает (строк/с, пиковая память в КБ, результат первого прохода)."""
+    tracemalloc.start()
+    first = [func(item) for item in inputs]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            result = func(item)
+            rows += len(result[0]) if isinstance(result, tuple) and isinstance(result[0], set) else (
+                len(result) if isinstance(result, list) else 1)
+    elapsed = time.perf_counter() - started
+    return rows / elapsed if elapsed else float("inf"), peak / 1024, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages-dir", help="каталог с сохранёнными страницами")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    backends = ["bs4"] + (["lxml"] if parsing.lxml is not None else [])
+    cases = {
+        "history": (pages["history"], {
+            "bs4": lambda item: parsing.parse_history_rows_bs4(*item),
+            "lxml": lambda item: parsing.parse_history_rows_lxml(*item),
+        }),
+        "members": (pages["members"], {
+            "bs4": parsing.parse_guild_members_bs4,
+            "lxml": parsing.parse_guild_members_lxml,
+        }),
+        "profile": (pages["profile"], {
+            backend: (lambda html, backend=backend: _parse_profile_with(backend, html)) for backend in backends
+        }),
+    }
+
+    print(f"{'страницы':<10}{'бэкенд':<8}{'строк/с':>12}{'пик, КБ':>12}{'ускорение':>12}")
+    for name, (inputs, funcs) in cases.items():
+        if not inputs:
+            continue
+        baseline_speed = None
+        baseline_result = None
+        for backend in backends:
+            speed, peak_kb, result = measure(funcs[backend], inputs, args.repeat)
+            if baseline_speed is None:
+                baseline_speed, baseline_result = speed, result
+            elif result != baseline_result:
+                print(f"  ВНИМАНИЕ: {backend} разбирает {name} иначе, чем bs4")
+            print(f"{name:<10}{backend:<8}{speed:>12.0f}{peak_kb:>12.0f}{speed / baseline_speed:>11.1f}x")
+
+
+def _parse_profile_with(backend, html):
+    saved = parsing.PARSER_BACKEND
+    parsing.PARSER_BACKEND = backend
+    try:
+        return parse_profile_page(html, "")
+    finally:
+        parsing.PARSER_BACKEND = saved
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Локальный стенд 11x11.ru для бенчмарков обхода: отдаёт синтетические страницы
+из benchmarks.fixtures с настраиваемой задержкой и долей ошибок.
+
+Маршруты повторяют те, что читает краулер:
+    GET  /                               — форма входа или главная со ссылкой "Выход"
+    POST /                               — вход (ставит cookie и перенаправляет на /)
+    GET  /guilds/<size>                  — страница союза с <h3>; id союза = число участников
+    GET  /users/<id>                     — профиль с "Сила 11 лучших" и таблицей игроков
+    GET  /xml/games/history.php          — история матчей (page, user)
+    GET  /xml/misc/guilds.php            — список участников (page, id)
+
+Запуск отдельно (для ручной проверки):
+    python -m benchmarks.stand_server --port 8011 --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import functools
+import random
+import threading
+
+from aiohttp import web
+
+from benchmarks import fixtures
+
+AUTH_COOKIE = "bench_auth"
+# id первого участника союза: участники союза <size> — это size * MEMBER_ID_BASE + i
+MEMBER_ID_BASE = 1_000_000
+
+
+class StandStats:
+    """Счётчики стенда: запросы, отданные страницы, внедрённые ошибки и байты."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.pages = 0
+        self.errors = 0
+        self.bytes = 0
+
+
+class Stand:
+    """
+    aiohttp-приложение стенда. latency — средняя задержка ответа в секундах
+    (равномерно от 0.5 до 1.5 от неё), error_rate — доля ответов 503,
+    matches — длина истории каждого игрока.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, matches=100, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.matches = matches
+        self.rng = random.Random(seed)
+        self.stats = StandStats()
+
+    @functools.lru_cache(maxsize=None)
+    def _matches(self, user_id):
+        return fixtures.make_matches(user_id, self.matches)
+
+    @web.middleware
+    async def _inject(self, request, handler):
+        self.stats.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats.errors += 1
+            return web.Response(status=503, text="Service Unavailable")
+        response = await handler(request)
+        self.stats.pages += 1
+        self.stats.bytes += len(response.body or b"")
+        return response
+
+    @staticmethod
+    def _html(text):
+        return web.Response(text=text, content_type="text/html", charset="utf-8")
+
+    async def main_page(self, request):
+        if request.cookies.get(AUTH_COOKIE):
+            return self._html('<html><body><a href="/users/1">Мой профиль</a> <a href="/logout">Выход</a></body></html>')
+        return self._html(
+            '<html><body><form method="post" action="/">'
+            '<input name="auth_name"><input name="auth_pass1" type="password">'
+            '<input type="submit" value="Войти"></form></body></html>'
+        )
+
+    async def login(self, request):
+        response = web.HTTPFound("/")
+        response.set_cookie(AUTH_COOKIE, "1")
+        raise response
+
+    async def guild_page(self, request):
+        size = request.match_info["size"]
+        return self._html(f"<html><body><h3>Союз {size}</h3></body></html>")
+
+    async def profile(self, request):
+        return self._html(fixtures.profile_page(request.match_info["user_id"]))
+
+    async def history(self, request):
+        user_id = request.query.get("user", "")
+        page_num = int(request.query.get("page", "1"))
+        return self._html(fixtures.history_page(user_id, self._matches(user_id), page_num))
+
+    async def members(self, request):
+        size = int(request.query.get("id", "0"))
+        page_num = int(request.query.get("page", "1"))
+        member_ids = [str(size * MEMBER_ID_BASE + i) for i in range(size)]
+        return self._html(fixtures.members_page(member_ids, page_num))
+
+    def app(self):
+        app = web.Application(middlewares=[self._inject])
+        app.router.add_get("/", self.main_page)
+        app.router.add_post("/", self.login)
+        app.router.add_get(r"/guilds/{size:\d+}", self.guild_page)
+        app.router.add_get(r"/users/{user_id:\d+}", self.profile)
+        app.router.add_get("/xml/games/history.php", self.history)
+        app.router.add_get("/xml/misc/guilds.php", self.members)
+        return app
+
+
+class StandThread:
+    """Стенд в фоновом потоке со своим event loop; base_url известен после start()."""
+
+    def __init__(self, stand, host="127.0.0.1", port=0):
+        self.stand = stand
+        self.host = host
+        self.port = port
+        self.base_url = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="bench-stand", daemon=True)
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.stand.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{self.host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=0.0, help="средняя задержка ответа, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--matches", type=int, default=100, help="матчей в истории каждого игрока")
+    args = parser.parse_args()
+    stand = Stand(args.latency, args.error_rate, args.matches)
+    web.run_app(stand.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
-import streamlit as st
-from pages.statistics import statistics_page
-from pages.roster import roster_page
-import os
+from utils.startup import report_startup, timed
+with timed("import pages"):
+    import streamlit as st
+    from pages.statistics import statistics_page
+    from pages.roster import roster_page
 
-# Если требуется одноразовая установка playwright:
-os.system("playwright install")
+# Chromium ставится в setup.sh; если его нет, BROWSER_POOL установит его при первом обходе
 
 def home_page():
     st.title("Добро пожаловать в 11x11 Статистика!")
@@ -35,6 +35,7 @@ def main():
         statistics_page()
     with tab_roster:
         roster_page()
+    report_startup("first render")
 
 if __name__ == "__main__":
     main()
@@ -1,229 +1,138 @@
 import streamlit as st
-import asyncio
-import nest_asyncio
-import pandas as pd
-import re
-from playwright.async_api import async_playwright
-from utils.data_processing import async_get_profiles_from_guild
-from bs4 import BeautifulSoup
-import os
-os.system("playwright install")
+import time
+from datetime import datetime
+from utils.jobs import JOB_FAILED, JOB_QUEUE
+from utils.site import BASE_URL
+from utils.startup import lazy_import
 
-# Патчим event loop для корректной работы асинхронного кода в Streamlit
-nest_asyncio.apply()
+# Как часто (секунды) опрашивать фоновый обход; на каждом опросе обновляется
+# строка прогресса, чтобы Streamlit мог прервать скрипт при смене виджетов или «Stop»
+POLL_INTERVAL = 0.5
 
-async def async_get_profile_stats(context, profile_url: str) -> tuple:
+def roster_table(roster):
     """
-    Открывает страницу профиля и извлекает:
-      - "Сила 11 лучших"
-      - "Gk": максимальное значение из колонки "Мас" для игроков, 
-         у которых в колонке "Поз" равно "Gk". При обходе таблицы игроков 
-         итерация прекращается при встрече строки с иным значением в "Поз".
-
-    Если хотя бы один показатель равен "N/A", функция повторяет всю процедуру до 5 раз.
-    Возвращает кортеж (power_value, gk_value).
+    Таблица участников: ник, ссылка на профиль и числовые "Сила 11 лучших" и Gk
+    ("N/A" становится пустым значением, чтобы колонки сортировались как числа).
+    Участники без ника отбрасываются.
     """
-    max_outer_attempts = 5
-    final_result = ("N/A", "N/A")
-    for outer_attempt in range(max_outer_attempts):
-        page = await context.new_page()
-        try:
-            # Внутренний цикл (до 3-х попыток навигации)
-            max_inner_attempts = 3
-            navigation_success = False
-            for inner in range(max_inner_attempts):
-                try:
-                    await page.goto(profile_url, timeout=15000, wait_until="domcontentloaded")
-                    navigation_success = True
-                    break
-                except Exception as e:
-                    print(f"Attempt {inner+1} to navigate to {profile_url} failed: {e}")
-                    await asyncio.sleep(1)
-            if not navigation_success:
-                final_result = ("N/A", "N/A")
-            else:
-                await asyncio.sleep(1)  # время для загрузки динамического контента
-                html = await page.content()
-                soup = BeautifulSoup(html, "html.parser")
-                
-                # Извлечение "Сила 11 лучших"
-                power_value = "N/A"
-                power_label_td = soup.find("td", string=re.compile(r"Сила\s*11\s*лучших", re.IGNORECASE))
-                if power_label_td:
-                    next_td = power_label_td.find_next_sibling("td")
-                    if next_td:
-                        power_value = next_td.get_text(strip=True)
-                        
-                # Извлечение показателя "Gk"
-                gk_value = "N/A"
-                try:
-                    players_table = None
-                    # Сначала ищем заголовок h3 с текстом "Игроки команды"
-                    h3_elem = soup.find("h3", string=re.compile(r"Игроки\s+команды", re.IGNORECASE))
-                    if h3_elem:
-                        players_table = h3_elem.find_next("table")
-                    # Если через h3 не найдено, перебираем все таблицы на предмет наличия "Поз" и "Мас"
-                    if not players_table:
-                        for table in soup.find_all("table"):
-                            header = table.find("tr")
-                            if header:
-                                header_text = header.get_text()
-                                if "Поз" in header_text and "Мас" in header_text:
-                                    players_table = table
-                                    break
-                    if players_table:
-                        # Определяем индексы колонок "Поз" и "Мас" (ищем по наличию подстроки, без учета регистра)
-                        header_cells = players_table.find("tr").find_all(["th", "td"])
-                        poz_index = None
-                        mas_index = None
-                        for i, cell in enumerate(header_cells):
-                            text = cell.get_text(strip=True).lower()
-                            if "поз" in text:
-                                poz_index = i
-                            if "мас" in text:
-                                mas_index = i
-                        if poz_index is not None and mas_index is not None:
-                            gk_masses = []
-                            rows = players_table.find_all("tr")[1:]  # пропускаем заголовок
-                            for row in rows:
-                                cells = row.find_all("td")
-                                if len(cells) > max(poz_index, mas_index):
-                                    poz_text = cells[poz_index].get_text(strip=True).lower()
-                                    # Если значение в "Поз" не равно "gk", прекращаем поиск
-                                    if poz_text != "gk":
-                                        break
-                                    mas_text = cells[mas_index].get_text(strip=True)
-                                    try:
-                                        mass_val = float(mas_text)
-                                    except:
-                                        mass_val = None
-                                    if mass_val is not None:
-                                        gk_masses.append(mass_val)
-                            if gk_masses:
-                                gk_value = str(max(gk_masses))
-                except Exception as e:
-                    print(f"Error extracting GK value for {profile_url}: {e}")
-                
-                final_result = (power_value, gk_value)
-        except Exception as ex:
-            print(f"General error in async_get_profile_stats for {profile_url}: {ex}")
-            final_result = ("N/A", "N/A")
-        finally:
-            await page.close()
-            
-        if final_result[0] != "N/A" and final_result[1] != "N/A":
-            return final_result
-        else:
-            print(f"Outer attempt {outer_attempt+1} for {profile_url} resulted in {final_result}. Retrying...")
-            await asyncio.sleep(1)
-    return final_result
+    pd = lazy_import("pandas")
+    df = pd.DataFrame(roster, columns=["Профиль", "Игрок", "Сила 11 лучших", "Gk"])
+    df = df[df["Игрок"].fillna("").str.strip() != ""]
+    for column in ("Сила 11 лучших", "Gk"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df[["Игрок", "Профиль", "Сила 11 лучших", "Gk"]]
+
+def delta_table(delta):
+    pd = lazy_import("pandas")
+    data = []
+    for row in delta:
+        data.append({
+            "Изменение": row["status"],
+            "Игрок": row["nickname"] or "",
+            "Профиль": row["profile_url"],
+            "Сила было": row["power_before"],
+            "Сила стало": row["power_after"],
+            "Δ Сила": row["power_change"],
+            "Gk было": row["gk_before"],
+            "Gk стало": row["gk_after"],
+            "Δ Gk": row["gk_change"],
+        })
+    df = pd.DataFrame(data)
+    for column in ("Сила было", "Сила стало", "Gk было", "Gk стало"):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
 
-async def async_get_roster(guild_url: str, login: str, password: str):
+def show_roster_delta(guild_url):
+    """Сравнивает два последних снимка союза: новые, ушедшие и участники с изменившимися силой или GK."""
+    roster_store = lazy_import("utils.roster_store")
+    with roster_store.RosterStore() as store:
+        # Фоновые снимки WARM_CACHE не показываются, поэтому и сравнивать с ними нельзя
+        snapshots = store.snapshots(guild_url, 2, include_background=False)
+    if len(snapshots) < 2:
+        st.caption("Это первый сохранённый ростер союза — сравнивать пока не с чем.")
+        return
+    current, previous = snapshots
+    delta = roster_store.roster_delta(previous.entries, current.entries)
+    st.markdown(f"### Изменения с {datetime.fromtimestamp(previous.taken_at):%d.%m.%Y %H:%M}")
+    if not delta:
+        st.write("Изменений нет.")
+        return
+    tables = lazy_import("utils.tables")
+    tables.render_table(delta_table(delta), "roster_delta", {"Профиль": tables.profile_link_column()})
+
+def show_roster_job(job, guild_url):
     """
-    Логинится на сайте, переходит на страницу союза и получает:
-      - Название союза (из элемента <h3>)
-      - Список участников союза (функция async_get_profiles_from_guild возвращает кортежи (profile_url, nickname))
-    Из списка исключается профиль, под которым выполнена авторизация.
-    Для каждого участника параллельно вызывается async_get_profile_stats для получения:
-      - "Сила 11 лучших"
-      - "Gk"
-    Используется asyncio.Semaphore для ограничения количества одновременно открытых страниц.
-    Возвращает кортеж:
-         (alliance_name, список кортежей (profile_url, nickname, power_value, gk_value))
+    Показывает фоновый обход ростера: таблица участников дописывается по мере
+    готовности, рядом — счётчик. Обход идёт в JOB_QUEUE независимо от сессии;
+    при ошибке на странице остаётся уже собранная часть. После успешного обхода
+    под таблицей — изменения относительно предыдущего снимка союза.
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-setuid-sandbox"]
-        )
-        context = await browser.new_context()
-        page = await context.new_page()
-        
-        # Авторизация
-        await page.goto("https://11x11.ru/", timeout=30000, wait_until="domcontentloaded")
-        await page.fill("input[name='auth_name']", login)
-        await page.fill("input[name='auth_pass1']", password)
-        await page.click("xpath=//input[@type='submit' and @value='Войти']")
-        await page.wait_for_selector("xpath=//a[contains(text(), 'Выход')]", timeout=15000)
-        
-        # Получаем URL залогиненного профиля для исключения
-        logged_profile_link = await page.query_selector("a[href^='/users/']")
-        logged_profile_url = None
-        if logged_profile_link:
-            href = await logged_profile_link.get_attribute("href")
-            if href and href.startswith("/users/"):
-                logged_profile_url = "https://11x11.ru" + href
-        
-        # Переход на страницу союза для получения названия союза
-        await page.goto(guild_url, timeout=30000, wait_until="domcontentloaded")
-        await asyncio.sleep(3)
-        alliance_name = "N/A"
-        try:
-            alliance_name_el = await page.wait_for_selector("h3", timeout=15000)
-            alliance_name = (await alliance_name_el.inner_text()).strip()
-        except Exception as e:
-            print(f"Error retrieving alliance name for {guild_url}: {e}")
-        
-        # Получаем список участников союза через async_get_profiles_from_guild
-        roster = await async_get_profiles_from_guild(page, guild_url)
-        if logged_profile_url:
-            roster = [entry for entry in roster if entry[0] != logged_profile_url]
-        await page.close()
-        
-        # Ограничиваем количество одновременно работающих задач с помощью семафора (лимит 20)
-        semaphore = asyncio.Semaphore(20)
-        async def safe_get_profile_stats(profile_url: str) -> tuple:
-            async with semaphore:
-                return await async_get_profile_stats(context, profile_url)
-        
-        tasks = []
-        for profile in roster:
-            profile_url, _ = profile
-            tasks.append(safe_get_profile_stats(profile_url))
-        stats_values = await asyncio.gather(*tasks)
-        
-        new_roster = []
-        for (profile_url, nickname), (power, gk) in zip(roster, stats_values):
-            new_roster.append((profile_url, nickname, power, gk))
-        
-        await context.close()
-        await browser.close()
-        return alliance_name, new_roster
+    tables = lazy_import("utils.tables")
+    column_config = {"Профиль": tables.profile_link_column()}
+    header = st.empty()
+    progress = st.progress(0.0, text="Загружаем ростер игроков...")
+    table = st.empty()
+    shown = 0
+    roster = []
+    fraction, text = 0.0, "Загружаем ростер игроков..."
+    started = time.monotonic()
+    while True:
+        status, items, error = job.snapshot()
+        if len(items) > shown:
+            shown = len(items)
+            alliance_name, done, total, _ = items[-1]
+            roster = [entry for _, _, _, entry in items if entry is not None]
+            if roster:
+                header.markdown(f"### Союз: {alliance_name}\n### Список участников:")
+                fraction, text = done / total, f"Обработано участников: {done} из {total}"
+                if not job.finished:
+                    tables.render_preview(table, roster_table(roster), column_config)
+            else:
+                header.markdown(f"### Союз: {alliance_name}")
+        if job.finished:
+            break
+        # Обновляется на каждом опросе, даже без новых участников
+        progress.progress(fraction, text=f"{text} · {time.monotonic() - started:.0f} с")
+        time.sleep(POLL_INTERVAL)
+    progress.empty()
+    if roster:
+        with table.container():
+            tables.render_table(roster_table(roster), "roster", column_config)
+    lazy_import("utils.metrics_panel").render_metrics_panel(job.metrics, "roster")
+    if status == JOB_FAILED:
+        st.error(f"Ошибка: {error}")
+    elif not any(entry is not None for _, _, _, entry in items):
+        table.write("Нет результатов.")
+    else:
+        counters = job.metrics.counters
+        st.caption(f"Профилей загружено: {counters.get('roster_refreshed', 0)}, "
+                   f"взято из сохранённого ростера: {counters.get('roster_reused', 0)}")
+        show_roster_delta(guild_url)
 
 def roster_page():
     st.title("Ростер игроков")
-    guild_url = st.text_input("Введите URL союза:", value="https://11x11.ru/guilds/139")
+    guild_url = st.text_input("Введите URL союза:", value=f"{BASE_URL}/guilds/139")
     login = "лао"
     password = "111333555"
+    refresh_all = st.checkbox("Обновить всех участников",
+                              help="Без флажка заново загружаются только новые участники и те, чьи данные устарели")
     
+    # Один и тот же союз из разных сессий обходится один раз
+    job_key = ("roster", guild_url, login, refresh_all)
     if st.button("Получить ростер"):
-        with st.spinner("Загружаем ростер игроков..."):
-            try:
-                loop = asyncio.get_event_loop()
-                alliance_name, roster = loop.run_until_complete(async_get_roster(guild_url, login, password))
-            except Exception as e:
-                st.error(f"Ошибка: {e}")
-                return
-        
-        st.markdown(f"### Союз: {alliance_name}")
-        if roster:
-            st.markdown("### Список участников:")
-            data = []
-            for profile_url, nickname, power, gk in roster:
-                data.append({
-                    "Профиль": f'<a href="{profile_url}" target="_blank">{nickname}</a>',
-                    "Сила 11 лучших": power,
-                    "Gk": gk
-                })
-            df = pd.DataFrame(data)
-            # Удаляем строки, где после очистки HTML-тегов в колонке "Профиль" пусто
-            df["Профиль_text"] = df["Профиль"].str.replace(r"<.*?>", "", regex=True).str.strip()
-            df = df[df["Профиль_text"] != ""]
-            df.drop("Профиль_text", axis=1, inplace=True)
-            st.markdown(df.to_html(escape=False, index=False), unsafe_allow_html=True)
-        else:
-            st.write("Нет результатов.")
+        # Обход (playwright, aiohttp, парсеры) импортируется только при первом запуске
+        roster_crawl = lazy_import("utils.roster")
+        # С первым обходом процесса включается фоновое обновление союзов из списка наблюдения
+        lazy_import("utils.warm_cache").WARM_CACHE.start(login, password)
+        max_age = 0 if refresh_all else lazy_import("utils.roster_store").ROSTER_TTL
+        JOB_QUEUE.submit(job_key, lambda: roster_crawl.async_iter_roster(guild_url, login, password, max_age),
+                         label=f"roster {guild_url}")
+        st.session_state["roster_job"] = job_key
 
+    # После перезапуска скрипта снова показываем обход, если союз не менялся
+    job = JOB_QUEUE.get(job_key) if st.session_state.get("roster_job") == job_key else None
+    if job is not None:
+        show_roster_job(job, guild_url)
 
 if __name__ == "__main__":
     roster_page()
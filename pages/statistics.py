@@ -1,10 +1,76 @@
 import streamlit as st
-import asyncio
-import pandas as pd
+import time
 from datetime import datetime
-from utils.data_processing import async_main  # Основной метод сбора статистики
-import os
-os.system("playwright install")
+from utils.jobs import JOB_FAILED, JOB_QUEUE
+from utils.site import BASE_URL
+from utils.startup import lazy_import
+
+# Как часто (секунды) опрашивать фоновый обход; на каждом опросе обновляется
+# строка прогресса, чтобы Streamlit мог прервать скрипт при смене виджетов или «Stop»
+POLL_INTERVAL = 0.5
+
+# Колонки таблицы результатов; "Профиль" хранит URL и показывается ссылкой
+RESULT_COLUMNS = ["Игрок", "Профиль", "Побед", "Ничьих", "Поражений"]
+
+def results_frame(profiles_results):
+    """Таблица результатов из кортежей process_profile (profile_url, nickname, wins, draws, losses)."""
+    rows = [(nickname, profile_url, wins, draws, losses)
+            for profile_url, nickname, wins, draws, losses in profiles_results]
+    return lazy_import("pandas").DataFrame(rows, columns=RESULT_COLUMNS)
+
+def show_statistics_job(job, mode_choice):
+    """
+    Показывает фоновый обход: таблица дописывается по мере готовности профилей,
+    рядом — счётчик обработанных профилей. Обход идёт в JOB_QUEUE независимо от
+    сессии, поэтому перезапуск скрипта лишь переподключается к нему. Если обход
+    прервался, на странице остаётся частичный результат с итогами по нему.
+    Пока обход идёт, видны последние строки; по его окончании — вся таблица
+    с поиском, сортировкой и страницами (utils.tables).
+    """
+    tables = lazy_import("utils.tables")
+    column_config = {"Профиль": tables.profile_link_column()}
+    progress = st.progress(0.0, text="🕒 Анализ данных...")
+    table = st.empty()
+    shown = 0
+    profiles_results = []
+    fraction, text = 0.0, "🕒 Анализ данных..."
+    started = time.monotonic()
+    while True:
+        status, items, error = job.snapshot()
+        if len(items) > shown:
+            shown = len(items)
+            done, total, _ = items[-1]
+            fraction, text = done / total, f"Обработано профилей: {done} из {total}"
+            profiles_results = [result for _, _, result in items if result is not None]
+            if profiles_results and not job.finished:
+                tables.render_preview(table, results_frame(profiles_results), column_config)
+        if job.finished:
+            break
+        # Обновляется на каждом опросе, даже без новых профилей (например, при долгом поиске по истории)
+        progress.progress(fraction, text=f"{text} · {time.monotonic() - started:.0f} с")
+        time.sleep(POLL_INTERVAL)
+    progress.empty()
+    if profiles_results:
+        with table.container():
+            tables.render_table(results_frame(profiles_results), "statistics", column_config)
+            data_processing = lazy_import("utils.data_processing")
+            if mode_choice == "Союзу":
+                total_players, active_count, inactive_count = data_processing.guild_totals(profiles_results)
+                st.markdown(f"**Всего игроков: {total_players}, играли: {active_count}, не играли: {inactive_count}**")
+            failed_count = sum(1 for result in profiles_results if data_processing.profile_failed(result))
+            if failed_count:
+                st.warning(f"Не удалось загрузить историю матчей у {failed_count} игроков — их строки пустые. "
+                           "Повторный сбор дочитает только недостающее.")
+    fresh_skips = job.metrics.counters.get("history_fresh_skips", 0)
+    if fresh_skips:
+        max_age = lazy_import("utils.data_processing").HISTORY_MAX_AGE
+        st.caption(f"История {fresh_skips} игроков взята из фонового обновления не старше {max_age} мин — "
+                   "матчи, сыгранные после него, не учтены.")
+    lazy_import("utils.metrics_panel").render_metrics_panel(job.metrics, "statistics")
+    if status == JOB_FAILED:
+        st.error(f"Сбор прерван: {error}." + (" Показан частичный результат." if shown else ""))
+    elif not shown:
+        table.write("Нет результатов.")
 
 def statistics_page():
     """Страница статистики матчей"""
@@ -25,26 +91,28 @@ def statistics_page():
         filter_to = datetime.strptime(dt_to, "%d.%m.%Y %H:%M")
 
     if mode_choice == "Профилю":
-        target_url = st.text_input("Введите URL профиля:", value="https://11x11.ru/users/3941656")
+        target_url = st.text_input("Введите URL профиля:", value=f"{BASE_URL}/users/3941656")
     else:
-        target_url = st.text_input("Введите URL союза:", value="https://11x11.ru/guilds/139")
+        target_url = st.text_input("Введите URL союза:", value=f"{BASE_URL}/guilds/139")
 
+    # Замените логин и пароль на свои данные
+    login = "лао"
+    password = "111333555"
+    # Одинаковые запросы (режим, URL, окно дат) из разных сессий получают один обход
+    job_key = ("statistics", mode_choice, target_url, filter_from, filter_to, login)
     if st.button("Собрать статистику"):
-        # Замените логин и пароль на свои данные
-        login = "лао"
-        password = "111333555"
-        st.write("🕒 Анализ данных...")
-        try:
-            results = asyncio.run(async_main(mode_choice, target_url, filter_from, filter_to, login, password))
-        except RuntimeError:
-            st.write("❌ Ошибка: asyncio.run() нельзя вызывать внутри уже работающего event loop.")
-            return
-
-        if results:
-            df = pd.DataFrame(results)
-            st.markdown(df.to_html(escape=False, index=False), unsafe_allow_html=True)
-        else:
-            st.write("Нет результатов.")
+        # Обход (playwright, aiohttp, парсеры) импортируется только при первом запуске
+        data_processing = lazy_import("utils.data_processing")
+        # С первым обходом процесса включается фоновое обновление союзов из списка наблюдения
+        lazy_import("utils.warm_cache").WARM_CACHE.start(login, password)
+        JOB_QUEUE.submit(job_key, lambda: data_processing.async_iter_main(mode_choice, target_url, filter_from, filter_to, login, password),
+                         label=f"statistics {target_url} {filter_from:%d.%m.%Y %H:%M}–{filter_to:%d.%m.%Y %H:%M}")
+        st.session_state["statistics_job"] = job_key
+
+    # После перезапуска скрипта снова показываем обход, если параметры не менялись
+    job = JOB_QUEUE.get(job_key) if st.session_state.get("statistics_job") == job_key else None
+    if job is not None:
+        show_statistics_job(job, mode_choice)
 
 if __name__ == "__main__":
     statistics_page()
@@ -1,8 +1,11 @@
+import hashlib
+
+import numpy as np
 import streamlit as st
 
 xp_table = {
     3: 30, 4: 90, 5: 190, 6: 340, 7: 540, 8: 840, 9: 1240, 10: 1790, 11: 2540, 12: 3540, 13: 5040, 14: 7040,
-    15: 10040, 16: 14040, 17: 19540, 18: 27040, 19: 37040, 20: 52040, 21: 72040, 22: 10740, 23: 157040,
+    15: 10040, 16: 14040, 17: 19540, 18: 27040, 19: 37040, 20: 52040, 21: 72040, 22: 107040, 23: 157040,
     24: 232040, 25: 332040, 26: 482040, 27: 682040, 28: 1032040, 29: 1532040, 30: 2282040, 31: 3282040,
     32: 4532040, 33: 6032040, 34: 7832040, 35: 9932040, 36: 12332040, 37: 15032040, 38: 18032040,
     39: 21532040, 40: 25532040, 41: 30332040, 42: 35932040, 43: 42332040, 44: 49532040, 45: 57532040,
@@ -14,14 +17,281 @@ xp_table = {
 default_levels = {
     "От": 2, "Оп": 2, "Др": 2, "Пм": 2, "Вн": 2, "Пс": 2, "Сл": 2, "Тч": 2
 }
+# Порядок характеристик в колонках матрицы уровней
+STATS = tuple(default_levels)
+MAX_LEVEL_OPTIONS = [37, 40, 50, 60]
+DEFAULT_MAX_LEVEL = 60
+# Сколько игроков планировщик решает динамикой за один проход
+PLAN_CHUNK = 256
 
 class XPTable:
     def __init__(self, xp_data: dict):
         self.xp_data = xp_data
+        # Накопленный опыт по индексу уровня; уровней, которых нет в xp_data, — 0, как у xp_data.get
+        self.cumulative = np.zeros(max(xp_data) + 1, dtype=np.int64)
+        for level, xp in xp_data.items():
+            self.cumulative[level] = xp
+        # Стоимость одного повышения: step_costs[l] — опыт на переход с уровня l на l + 1
+        self.step_costs = np.diff(self.cumulative)
+
+    def xp_at(self, levels):
+        """Накопленный опыт для массива уровней любой формы; уровни вне таблицы дают 0."""
+        levels = np.asarray(levels, dtype=np.int64)
+        inside = (levels >= 0) & (levels < len(self.cumulative))
+        return np.where(inside, self.cumulative[np.clip(levels, 0, len(self.cumulative) - 1)], 0)
 
     def xp_between(self, start_level, end_level):
         return self.xp_data.get(end_level, 0) - self.xp_data.get(start_level, 0)
 
+class PlayerBatch:
+    """
+    Игроки целым составом: levels — матрица уровней (игроки × STATS),
+    max_levels и unspent_xp — по значению на игрока. Опыт считается для
+    всех игроков сразу одной векторной операцией по XPTable.cumulative.
+    """
+
+    def __init__(self, names, levels, max_levels, unspent_xp, xp_table: XPTable):
+        self.names = list(names)
+        self.levels = np.asarray(levels, dtype=np.int64).reshape(len(self.names), len(STATS))
+        self.max_levels = np.asarray(max_levels, dtype=np.int64).reshape(len(self.names))
+        self.unspent_xp = np.asarray(unspent_xp, dtype=np.int64).reshape(len(self.names))
+        self.xp_table = xp_table
+        self._results = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_players(cls, players, xp_table: XPTable):
+        return cls(
+            [p.name for p in players],
+            [[p.levels[stat] for stat in STATS] for p in players],
+            [p.max_level for p in players],
+            [p.unspent_xp for p in players],
+            xp_table,
+        )
+
+    @classmethod
+    def from_frame(cls, df, xp_table: XPTable, max_level: int = DEFAULT_MAX_LEVEL):
+        """
+        Состав из таблицы (CSV): колонка "Имя", колонки характеристик STATS,
+        необязательные "Макс. ур." и "Нераспределённый опыт". Пропущенные
+        характеристики равны уровню по умолчанию, уровни ограничиваются
+        диапазоном от 2 до максимального уровня игрока.
+        """
+        if "Имя" not in df.columns:
+            raise ValueError('в таблице нет колонки "Имя"')
+
+        import pandas as pd
+
+        def column(name, default):
+            if name not in df.columns:
+                return np.full(len(df), default, dtype=np.int64)
+            # Разделители разрядов ("1 032 040") убираются, нечисловые значения заменяются default
+            values = pd.to_numeric(df[name].astype(str).str.replace(r"\s", "", regex=True), errors="coerce")
+            return values.fillna(default).to_numpy().astype(np.int64)
+
+        max_levels = column("Макс. ур.", max_level)
+        levels = np.column_stack([column(stat, default_levels[stat]) for stat in STATS])
+        levels = np.clip(levels, 2, max_levels[:, None])
+        unspent = np.maximum(column("Нераспределённый опыт", 0), 0)
+        return cls(df["Имя"].fillna("").astype(str).str.strip(), levels, max_levels, unspent, xp_table)
+
+    @classmethod
+    def concat(cls, batches, xp_table: XPTable):
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls([], np.empty((0, len(STATS))), [], [], xp_table)
+        return cls(
+            [name for b in batches for name in b.names],
+            np.concatenate([b.levels for b in batches]),
+            np.concatenate([b.max_levels for b in batches]),
+            np.concatenate([b.unspent_xp for b in batches]),
+            xp_table,
+        )
+
+    def fingerprint(self) -> str:
+        """Хэш имён, уровней, максимумов и опыта состава — ключ кэша плана между перезапусками скрипта."""
+        digest = hashlib.sha1("\0".join(self.names).encode("utf-8"))
+        for array in (self.levels, self.max_levels, self.unspent_xp):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def results(self):
+        """Словарь массивов: распределённый, всего накопленный и оставшийся до максимума опыт."""
+        if self._results is None:
+            at_levels = self.xp_table.xp_at(self.levels)
+            distributed = (at_levels - self.xp_table.xp_at(2)).sum(axis=1)
+            raw_remaining = (self.xp_table.xp_at(self.max_levels)[:, None] - at_levels).sum(axis=1)
+            self._results = {
+                "distributed": distributed,
+                "accumulated": distributed + self.unspent_xp,
+                "remaining": np.maximum(raw_remaining - self.unspent_xp, 0),
+            }
+        return self._results
+
+    def summary_row(self, i):
+        results = self.results()
+        return {
+            "Имя": self.names[i],
+            "Макс. ур.": int(self.max_levels[i]),
+            "Распределённый опыт": int(results["distributed"][i]),
+            "Нераспределённый опыт": int(self.unspent_xp[i]),
+            "Всего опыта": int(results["accumulated"][i]),
+            "Осталось до макс.": int(results["remaining"][i])
+        }
+
+    def frame(self):
+        """Таблица итогов по всем игрокам (те же колонки, что у summary_row) без построчного цикла."""
+        import pandas as pd
+        results = self.results()
+        return pd.DataFrame({
+            "Имя": self.names,
+            "Макс. ур.": self.max_levels,
+            "Распределённый опыт": results["distributed"],
+            "Нераспределённый опыт": self.unspent_xp,
+            "Всего опыта": results["accumulated"],
+            "Осталось до макс.": results["remaining"],
+        })
+
+    def plan(self, weights=None, targets=None, budgets=None):
+        """План распределения для всех игроков состава (см. plan_allocation); бюджет по умолчанию — нераспределённый опыт."""
+        return plan_allocation(
+            self.xp_table, self.levels, self.unspent_xp if budgets is None else budgets,
+            self.max_levels, weights, targets
+        )
+
+    def plan_frame(self, weights=None, targets=None, budgets=None):
+        """Таблица плана: новые уровни характеристик, число повышений, потраченный и оставшийся опыт."""
+        import pandas as pd
+        plan = self.plan(weights, targets, budgets)
+        df = pd.DataFrame(plan["levels"], columns=list(STATS))
+        df.insert(0, "Имя", self.names)
+        df["Повышений"] = plan["level_ups"]
+        df["Потрачено"] = plan["spent"]
+        df["Остаток"] = plan["left"]
+        return df
+
+def _plan_level_ups(costs, budgets):
+    """
+    Максимум повышений: стоимости каждой характеристики не убывают с уровнем,
+    поэтому оптимален набор самых дешёвых шагов по всем характеристикам сразу.
+    costs — (игроки × характеристики × шаги), недоступные шаги равны inf.
+    Устойчивая сортировка сохраняет порядок шагов внутри характеристики, так что
+    взятые шаги каждой из них идут подряд с текущего уровня.
+    """
+    n, stats, steps = costs.shape
+    flat = costs.reshape(n, stats * steps)
+    order = np.argsort(flat, axis=1, kind="stable")
+    cumulative = np.cumsum(np.take_along_axis(flat, order, axis=1), axis=1)
+    taken = (cumulative <= budgets[:, None]).sum(axis=1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(stats * steps), order.shape), axis=1)
+    return (ranks < taken[:, None]).reshape(n, stats, steps).sum(axis=2)
+
+def _plan_weighted(costs, budgets, weights):
+    """
+    Максимум суммы weights × повышений: рюкзак с группами по характеристикам,
+    динамика «минимальный опыт за набранную ценность» (см. _plan_weighted_chunk).
+    Ширина таблицы у каждого игрока ограничена тем, что он может оплатить: по
+    характеристике — не больше повышений, чем хватает бюджета на неё одну, а в
+    сумме — не больше max(weights) × наибольшее число повышений (_plan_level_ups).
+    Игроки решаются пачками по PLAN_CHUNK в порядке этой ширины, поэтому время и
+    память растут с суммой ширин игроков, а не с размером состава × самой широкой строкой.
+    """
+    n, stats, steps = costs.shape
+    prefix = np.concatenate([np.zeros((n, stats, 1)), np.cumsum(costs, axis=2)], axis=2)
+    affordable = (prefix[:, :, 1:] <= budgets[:, None, None]).sum(axis=2)
+    widths = np.minimum((affordable * weights).sum(axis=1), int(weights.max()) * _plan_level_ups(costs, budgets).sum(axis=1)) + 1
+    gains = np.zeros((n, stats), dtype=np.int64)
+    order = np.argsort(widths, kind="stable")
+    for start in range(0, n, PLAN_CHUNK):
+        rows = order[start:start + PLAN_CHUNK]
+        gains[rows] = _plan_weighted_chunk(prefix[rows], affordable[rows], budgets[rows], weights,
+                                           int(widths[rows].max()))
+    return gains
+
+def _plan_weighted_chunk(prefix, affordable, budgets, weights, values):
+    """
+    Динамика для пачки игроков: best[v] — минимальный опыт за ценность v,
+    v < values. Для каждой характеристики запоминается выбранное число
+    повышений для восстановления ответа; диапазон достижимых ценностей растёт
+    по мере добавления характеристик, и обрабатывается только он, поэтому
+    характеристики идут по возрастанию веса (тяжёлые — на уже широком диапазоне реже).
+    """
+    n, stats = affordable.shape
+    best = np.full((n, values), np.inf)
+    best[:, 0] = 0
+    reach = 0
+    order = np.argsort(weights, kind="stable")
+    choices = {}
+    for stat in order:
+        weight = int(weights[stat])
+        choice = np.zeros((n, values), dtype=np.int8)
+        top = min(int(affordable[:, stat].max()), (values - 1) // weight) if weight > 0 else 0
+        if top:
+            updated = best.copy()
+            for gain in range(1, top + 1):
+                shift = weight * gain
+                size = min(reach + 1, values - shift)
+                candidate = best[:, :size] + prefix[:, stat, gain, None]
+                better = candidate < updated[:, shift:shift + size]
+                np.copyto(updated[:, shift:shift + size], candidate, where=better)
+                np.copyto(choice[:, shift:shift + size], gain, where=better)
+            best = updated
+            reach = min(values - 1, reach + weight * top)
+        choices[stat] = choice
+    feasible = best <= budgets[:, None]
+    value = values - 1 - np.argmax(feasible[:, ::-1], axis=1)
+    gains = np.zeros((n, stats), dtype=np.int64)
+    rows = np.arange(n)
+    for stat in order[::-1]:
+        gains[:, stat] = choices[stat][rows, value]
+        value -= int(weights[stat]) * gains[:, stat]
+    return gains
+
+def plan_allocation(xp_table: XPTable, levels, budgets, max_levels, weights=None, targets=None):
+    """
+    Лучшее распределение опыта budgets по характеристикам для одного или многих игроков.
+
+    levels — матрица текущих уровней (игроки × STATS), budgets и max_levels — по
+    значению на игрока. weights — целые веса характеристик (по умолчанию все 1,
+    то есть максимум повышений; 0 — не качать), targets — уровни, выше которых
+    характеристику не поднимать (по умолчанию максимальный уровень игрока).
+    Равные веса решаются жадно по самым дешёвым шагам, разные — динамикой по
+    ценности; оба способа дают оптимум и работают для всего состава за один проход.
+    Возвращает словарь массивов: "levels" (новые уровни), "level_ups", "value"
+    (сумма весов × повышений), "spent" и "left".
+    """
+    levels = np.atleast_2d(np.asarray(levels, dtype=np.int64))
+    n = len(levels)
+    budgets = np.broadcast_to(np.asarray(budgets, dtype=np.float64), (n,))
+    caps = np.broadcast_to(np.asarray(max_levels, dtype=np.int64).reshape(-1, 1), (n, len(STATS)))
+    if targets is not None:
+        caps = np.minimum(caps, np.asarray(targets, dtype=np.int64))
+    caps = np.minimum(caps, len(xp_table.cumulative) - 1)
+    weights = np.ones(len(STATS), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+
+    steps = max(int((caps - levels).max(initial=0)), 1)
+    step_levels = levels[:, :, None] + np.arange(steps)
+    costs = xp_table.step_costs[np.clip(step_levels, 0, len(xp_table.step_costs) - 1)].astype(np.float64)
+    costs[(step_levels >= caps[:, :, None]) | (weights[None, :, None] <= 0)] = np.inf
+
+    active = np.unique(weights[weights > 0])
+    if len(active) <= 1:
+        gains = _plan_level_ups(costs, budgets)
+    else:
+        gains = _plan_weighted(costs, budgets, weights)
+    new_levels = levels + gains
+    spent = (xp_table.xp_at(new_levels) - xp_table.xp_at(levels)).sum(axis=1)
+    return {
+        "levels": new_levels,
+        "level_ups": gains.sum(axis=1),
+        "value": (gains * weights).sum(axis=1),
+        "spent": spent,
+        "left": (budgets - spent).astype(np.int64),
+    }
+
 class Player:
     def __init__(self, name: str, levels: dict, xp_table: XPTable, max_level: int, unspent_xp: int = 0):
         self.name = name
@@ -30,25 +300,25 @@ class Player:
         self.unspent_xp = unspent_xp
         self.max_level = max_level
 
+    def batch(self):
+        return PlayerBatch.from_players([self], self.xp_table)
+
     def distributed_xp(self):
-        return sum(self.xp_table.xp_between(2, lvl) for lvl in self.levels.values())
+        return int(self.batch().results()["distributed"][0])
 
     def total_xp_accumulated(self):
-        return self.distributed_xp() + self.unspent_xp
+        return int(self.batch().results()["accumulated"][0])
 
     def total_xp_remaining(self):
-        raw_remaining = sum(self.xp_table.xp_between(lvl, self.max_level) for lvl in self.levels.values())
-        return max(raw_remaining - self.unspent_xp, 0)
+        return int(self.batch().results()["remaining"][0])
 
     def summary_row(self):
-        return {
-            "Имя": self.name,
-            "Макс. ур.": self.max_level,
-            "Распределённый опыт": self.distributed_xp(),
-            "Нераспределённый опыт": self.unspent_xp,
-            "Всего опыта": self.total_xp_accumulated(),
-            "Осталось до макс.": self.total_xp_remaining()
-        }
+        return self.batch().summary_row(0)
+
+    def plan(self, weights=None, targets=None, budget=None):
+        """План распределения нераспределённого (или заданного budget) опыта: словарь STATS -> новый уровень."""
+        plan = self.batch().plan(weights, targets, None if budget is None else [budget])
+        return dict(zip(STATS, plan["levels"][0].tolist()))
 
 def create_player(name: str, custom_levels: dict, xp_table: XPTable, max_level: int, unspent_xp: int = 0) -> Player:
     full_levels = default_levels.copy()
@@ -60,6 +330,9 @@ def main():
 
     if 'players' not in st.session_state:
         st.session_state['players'] = []
+    # Составы, загруженные из файлов, хранятся целиком как PlayerBatch
+    if 'imported' not in st.session_state:
+        st.session_state['imported'] = []
 
     st.title("Калькулятор опыта команды")
 
@@ -67,8 +340,8 @@ def main():
         name = st.text_input("Фамилия/Имя игрока")
         max_level = st.selectbox(
             "До какого уровня считать максимум?",
-            options=[37, 40, 50, 60],
-            index=3
+            options=MAX_LEVEL_OPTIONS,
+            index=MAX_LEVEL_OPTIONS.index(DEFAULT_MAX_LEVEL)
         )
         levels = {}
         st.write("Уровни характеристик:")
@@ -85,19 +358,77 @@ def main():
             st.session_state['players'].append(player)
             st.success(f"Добавлен игрок: {name}")
 
+    with st.expander("Загрузить состав из CSV"):
+        st.caption(f'Колонки: "Имя", {", ".join(STATS)}; необязательные — "Макс. ур." и "Нераспределённый опыт". '
+                   "Разделитель (запятая или точка с запятой) определяется автоматически.")
+        import_max_level = st.selectbox(
+            "Максимальный уровень для строк без «Макс. ур.»",
+            options=MAX_LEVEL_OPTIONS,
+            index=MAX_LEVEL_OPTIONS.index(DEFAULT_MAX_LEVEL),
+            key="import_max_level"
+        )
+        upload = st.file_uploader("CSV-файл состава", type=["csv"])
+        if upload is not None and st.button("Добавить игроков из файла"):
+            import pandas as pd
+            try:
+                df = pd.read_csv(upload, sep=None, engine="python", encoding="utf-8-sig")
+                batch = PlayerBatch.from_frame(df, xp_x, import_max_level)
+            except (ValueError, pd.errors.ParserError) as e:
+                st.error(f"Не удалось прочитать файл: {e}")
+            else:
+                st.session_state['imported'].append(batch)
+                st.success(f"Добавлено игроков: {len(batch)}")
+
     st.subheader("Список игроков и результаты:")
     if st.button("Очистить список игроков"):
         st.session_state['players'] = []
+        st.session_state['imported'] = []
         st.info("Список очищен!")
 
-    if st.session_state['players']:
-        import pandas as pd
-        rows = [player.summary_row() for player in st.session_state['players']]
-        df = pd.DataFrame(rows)
-        st.dataframe(df)
+    if st.session_state['players'] or st.session_state['imported']:
+        from utils.tables import render_table
+        batch = PlayerBatch.concat(
+            [PlayerBatch.from_players(st.session_state['players'], xp_x), *st.session_state['imported']], xp_x
+        )
+        render_table(batch.frame(), "xp_players", search_column="Имя")
+        plan_section(batch, xp_x)
     else:
         st.info("Пока нет игроков в списке.")
 
+@st.cache_data(max_entries=16, show_spinner="Считаем план...")
+def _cached_plan_frame(_batch: PlayerBatch, fingerprint: str, weights: tuple, targets: tuple):
+    """План состава (PlayerBatch.plan_frame), пересчитываемый только при смене состава, весов или целей."""
+    return _batch.plan_frame(list(weights), list(targets))
+
+def plan_section(batch: PlayerBatch, xp_x: XPTable):
+    st.subheader("Планировщик опыта")
+    st.caption("Вес 0 — характеристику не качать; при равных весах план даёт максимум повышений.")
+    weights, targets = [], []
+    for column, stat in zip(st.columns(len(STATS)), STATS):
+        weights.append(column.number_input(f"Вес {stat}", min_value=0, max_value=10, value=1, key=f"plan_weight_{stat}"))
+        targets.append(column.number_input(f"Цель {stat}", min_value=2, max_value=DEFAULT_MAX_LEVEL,
+                                           value=DEFAULT_MAX_LEVEL, key=f"plan_target_{stat}"))
+
+    scope = st.radio("Считать для", ("Одного игрока", "Всего состава"), horizontal=True, key="plan_scope")
+    if scope == "Всего состава":
+        from utils.tables import render_table
+        plan = _cached_plan_frame(batch, batch.fingerprint(), tuple(weights), tuple(targets))
+        render_table(plan, "xp_plan", search_column="Имя")
+        return
+
+    i = st.selectbox("Игрок", range(len(batch)), format_func=lambda i: batch.names[i] or f"#{i + 1}", key="plan_player")
+    # Бюджет можно менять, чтобы сравнить варианты «что если»; по умолчанию — нераспределённый опыт игрока
+    budget = st.number_input("Опыт для распределения", min_value=0, value=int(batch.unspent_xp[i]), step=10000)
+    plan = plan_allocation(xp_x, batch.levels[i], [budget], [batch.max_levels[i]], weights, targets)
+    import pandas as pd
+    st.dataframe(pd.DataFrame({
+        "Характеристика": STATS,
+        "Сейчас": batch.levels[i],
+        "После": plan["levels"][0],
+        "Повышений": plan["levels"][0] - batch.levels[i],
+    }), hide_index=True)
+    st.write(f"Повышений: {plan['level_ups'][0]}, потрачено: {plan['spent'][0]}, остаток: {plan['left'][0]}")
+
 if __name__ == "__main__":
     main()
     
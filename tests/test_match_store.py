@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from utils.data_processing import history_is_fresh
+from utils.match_store import MatchStore, to_minutes
+
+
+def test_only_background_checks_skip_the_newest_page():
+    now = to_minutes(datetime.now())
+    with MatchStore(":memory:") as store:
+        # Интерактивный обход прочитал первую страницу только что: повторный запрос должен читать её снова
+        store.save_sync("1", [], now - 60, now, checked_at=now)
+        assert not history_is_fresh(store, "1")
+
+        store.background = True
+        store.save_sync("1", [], now - 60, now, checked_at=now)
+        assert history_is_fresh(store, "1")
+        assert not history_is_fresh(store, "1", max_age=-1)
+
+        # Более позднее интерактивное чтение снимает отметку фонового
+        store.background = False
+        store.save_sync("1", [], now - 60, now, checked_at=now + 1)
+        assert not history_is_fresh(store, "1")
@@ -0,0 +1,30 @@
+import asyncio
+import json
+
+from utils import metrics
+from utils.metrics import CrawlMetrics, use_metrics
+from utils.scheduler import CrawlScheduler
+
+
+def test_failures_reach_the_export(tmp_path):
+    async def failing():
+        raise ConnectionError("down")
+
+    async def crawl():
+        scheduler = CrawlScheduler(max_attempts=2)
+        scheduler.backoff = lambda attempt: 0
+        return await asyncio.gather(scheduler.run(failing), return_exceptions=True)
+
+    # Как в sharding: метрики шарда сливаются в метрики обхода
+    shard = CrawlMetrics()
+    with use_metrics(shard):
+        metrics.failure("failed_profiles", "Failed to crawl /users/1: timeout")
+        assert isinstance(asyncio.run(crawl())[0], ConnectionError)
+    crawl_metrics = CrawlMetrics("Союзу: 40")
+    crawl_metrics.merge(shard.to_dict(raw=True))
+
+    path = tmp_path / "metrics.jsonl"
+    crawl_metrics.export(str(path))
+    exported = json.loads(path.read_text(encoding="utf-8"))
+    assert exported["counters"] == {"failed_profiles": 1, "retries": 1, "failed_requests": 1}
+    assert exported["failures"] == [{"counter": "failed_profiles", "message": "Failed to crawl /users/1: timeout"}]
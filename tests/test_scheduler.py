@@ -0,0 +1,39 @@
+import asyncio
+
+from utils.scheduler import INITIAL_LIMIT, CrawlScheduler
+
+
+def test_cancelled_attempts_do_not_lower_limit():
+    async def scenario():
+        scheduler = CrawlScheduler()
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        # Так обход страниц отменяет лишние предзагрузки, а async_iter_completed — незавершённые задачи
+        tasks = [asyncio.ensure_future(scheduler.run(slow)) for _ in range(INITIAL_LIMIT)]
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.limit == INITIAL_LIMIT
+    assert scheduler.in_flight == 0
+    assert scheduler.retry_budget.retries_left >= 50
+
+
+def test_network_errors_lower_limit():
+    async def scenario():
+        scheduler = CrawlScheduler(max_attempts=1)
+
+        async def failing():
+            raise ConnectionError("down")
+
+        results = await asyncio.gather(scheduler.run(failing), return_exceptions=True)
+        assert isinstance(results[0], ConnectionError)
+        return scheduler
+
+    assert asyncio.run(scenario()).limit < INITIAL_LIMIT
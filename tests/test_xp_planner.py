@@ -0,0 +1,55 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import streamlit_app as app
+
+XP = app.XPTable(app.xp_table)
+
+
+def brute_force_value(levels, budget, caps, weights):
+    """Лучшая сумма weights × повышений перебором всех вариантов."""
+    best = 0
+    ranges = [range(max(cap - level, 0) + 1) for level, cap in zip(levels, caps)]
+    for gains in itertools.product(*ranges):
+        cost = sum(XP.cumulative[level + gain] - XP.cumulative[level] for level, gain in zip(levels, gains))
+        if cost <= budget:
+            best = max(best, sum(w * gain for w, gain in zip(weights, gains)))
+    return best
+
+
+def random_case(rng, weighted):
+    # Перебор остаётся быстрым: качаются только три характеристики, по 0–4 уровня
+    levels = [rng.randint(2, 30) for _ in app.STATS]
+    caps = [min(app.DEFAULT_MAX_LEVEL, level + rng.randint(0, 4)) if i < 3 else level
+            for i, level in enumerate(levels)]
+    weights = [rng.randint(0, 4) for _ in app.STATS] if weighted else None
+    return levels, caps, weights, rng.randint(0, 3_000_000)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_plan_matches_brute_force(weighted):
+    rng = random.Random(3)
+    for _ in range(150):
+        levels, caps, weights, budget = random_case(rng, weighted)
+        plan = app.plan_allocation(XP, [levels], [budget], [app.DEFAULT_MAX_LEVEL], weights, [caps])
+        expected = brute_force_value(levels, budget, caps, weights or [1] * len(app.STATS))
+        assert plan["value"][0] == expected, (levels, caps, weights, budget)
+        assert plan["spent"][0] <= budget
+        assert (plan["levels"][0] <= np.array(caps)).all()
+
+
+def test_squad_plan_matches_single_player_plans():
+    # Состав больше PLAN_CHUNK, чтобы игроки решались в разных пачках с разной шириной таблицы
+    rng = np.random.default_rng(0)
+    n = app.PLAN_CHUNK + 50
+    levels = rng.integers(2, 40, (n, len(app.STATS)))
+    budgets = rng.integers(0, 10 ** 9, n)
+    weights = [10, 1, 3, 7, 2, 5, 0, 4]
+    squad = app.plan_allocation(XP, levels, budgets, np.full(n, 60), weights)
+    for i in rng.choice(n, 20, replace=False):
+        single = app.plan_allocation(XP, levels[i], [budgets[i]], [60], weights)
+        assert squad["value"][i] == single["value"][0]
+        assert squad["spent"][i] <= budgets[i]
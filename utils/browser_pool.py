@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from playwright.async_api import Error as PlaywrightError, async_playwright
+from utils.http_client import decode_html
+from utils.site import BASE_URL
+from utils.startup import async_install_browser
+
+# Каталог для сохранённых storage_state (cookies авторизации), переопределяется через GLEB_STATE_DIR
+STATE_DIR = os.environ.get(
+    "GLEB_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+)
+LAUNCH_ARGS = ["--no-sandbox", "--disable-setuid-sandbox"]
+# Типы ресурсов, которые не нужны парсеру и не загружаются вкладками пула
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+# Как часто (в секундах) проверять, что сессия на сайте ещё жива
+SESSION_CHECK_INTERVAL = 300
+
+_PROFILE_LINK_RE = re.compile(r'href="(/users/\d+)"')
+_CHARSET_RE = re.compile(r"charset=([\w-]+)", re.IGNORECASE)
+
+
+async def async_login(page, login, password, timeout=15000):
+    """Выполняет вход на сайт через форму авторизации на главной странице."""
+    await page.goto(f"{BASE_URL}/", timeout=timeout, wait_until="domcontentloaded")
+    await page.fill("input[name='auth_name']", login)
+    await page.fill("input[name='auth_pass1']", password)
+    await page.click("xpath=//input[@type='submit' and @value='Войти']")
+    await page.wait_for_selector("xpath=//a[contains(text(), 'Выход')]", timeout=15000)
+
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class LoginSession:
+    """Авторизованный контекст браузера и сведения о вошедшем пользователе."""
+
+    def __init__(self, context, profile_url, user_agent):
+        self.context = context
+        self.profile_url = profile_url
+        self.user_agent = user_agent
+        self.checked_at = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Один Chromium на процесс и по одному авторизованному контексту на логин.
+
+    Объект живёт на уровне модуля и переживает перезапуски скрипта Streamlit,
+    поэтому вход через форму выполняется один раз, а не на каждое нажатие кнопки.
+    Раз в SESSION_CHECK_INTERVAL сессия проверяется лёгким запросом главной
+    страницы и при необходимости выполняется повторный вход. Cookies сохраняются
+    в storage_state, так что и после перезапуска процесса форма входа не нужна.
+
+    Во всех контекстах пула картинки, стили, шрифты и медиа отключены через
+    перехват запросов (BLOCKED_RESOURCE_TYPES): парсерам нужен только HTML.
+
+    Объекты Playwright привязаны к event loop, в котором созданы. Страницы
+    работают с пулом только из общего loop utils.runtime.RUNTIME, поэтому браузер
+    живёт между нажатиями; если пул всё же вызван из другого loop, браузер
+    запускается заново (вход при этом восстанавливается из storage_state).
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = None
+        self._playwright = None
+        self._browser = None
+        self._sessions = {}
+
+    @staticmethod
+    def _state_path(login):
+        digest = hashlib.sha1(login.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(STATE_DIR, f"storage_state_{digest}.json")
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Прежний loop завершён — его объекты Playwright больше не пригодны
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._playwright = None
+            self._browser = None
+            self._sessions = {}
+
+    async def _ensure_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            try:
+                self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+            except PlaywrightError as e:
+                # Браузер ставится при первом обходе, а не при импорте страниц
+                if "Executable doesn't exist" not in str(e) or not await async_install_browser():
+                    raise
+                self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+            self._sessions = {}
+
+    async def _check_session(self, context):
+        """Проверяет авторизацию запросом главной страницы; возвращает URL профиля или None."""
+        try:
+            response = await context.request.get(f"{BASE_URL}/", timeout=15000)
+            charset = _CHARSET_RE.search(response.headers.get("content-type", ""))
+            html = decode_html(await response.body(), charset.group(1) if charset else None)
+        except Exception as e:
+            print(f"Session check failed: {e}")
+            return None
+        if "Выход" not in html:
+            return None
+        link = _PROFILE_LINK_RE.search(html)
+        return f"{BASE_URL}{link.group(1)}" if link else ""
+
+    async def _new_context(self, **kwargs):
+        context = await self._browser.new_context(**kwargs)
+        await context.route("**/*", _block_heavy_resources)
+        return context
+
+    async def _open_session(self, login, password):
+        state_path = self._state_path(login)
+        if os.path.exists(state_path):
+            context = await self._new_context(storage_state=state_path)
+            profile_url = await self._check_session(context)
+            if profile_url is not None:
+                page = await context.new_page()
+                user_agent = await page.evaluate("navigator.userAgent")
+                await page.close()
+                return LoginSession(context, profile_url or None, user_agent)
+            await context.close()
+
+        context = await self._new_context()
+        page = await context.new_page()
+        try:
+            await async_login(page, login, password, timeout=30000)
+            profile_url = None
+            link = await page.query_selector("a[href^='/users/']")
+            if link:
+                href = await link.get_attribute("href")
+                if href and href.startswith("/users/"):
+                    profile_url = BASE_URL + href
+            user_agent = await page.evaluate("navigator.userAgent")
+        except Exception:
+            await context.close()
+            raise
+        finally:
+            if not page.is_closed():
+                await page.close()
+        os.makedirs(STATE_DIR, exist_ok=True)
+        await context.storage_state(path=state_path)
+        return LoginSession(context, profile_url, user_agent)
+
+    async def acquire(self, login, password) -> LoginSession:
+        """Возвращает живую авторизованную сессию для логина, при необходимости входя заново."""
+        self._bind_loop()
+        async with self._lock:
+            await self._ensure_browser()
+            session = self._sessions.get(login)
+            if session is not None and time.monotonic() - session.checked_at > SESSION_CHECK_INTERVAL:
+                if await self._check_session(session.context) is None:
+                    print(f"Session for {login} expired, logging in again")
+                    await session.context.close()
+                    session = None
+                else:
+                    session.checked_at = time.monotonic()
+            if session is None:
+                session = await self._open_session(login, password)
+                self._sessions[login] = session
+            return session
+
+
+BROWSER_POOL = BrowserPool()
@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class TTLCache:
+    """Потокобезопасный словарь, записи которого устаревают через ttl секунд."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Возвращает значение или None, если записи нет или она устарела."""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._items[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -1,187 +1,415 @@
 import asyncio
+import os
 import requests
-from bs4 import BeautifulSoup
 import re
+from contextlib import aclosing
 from datetime import datetime
 import streamlit as st
-from playwright.async_api import async_playwright, TimeoutError
+from utils import metrics
+from utils.browser_pool import BROWSER_POOL
+from utils.cache import TTLCache
+from utils.http_client import FETCH_ERRORS, async_fetch_html, create_http_session, supports_concurrent_fetch
+from utils.match_index import get_match_index
+from utils.match_store import MatchStore, to_minutes
+from utils.pagination import HISTORY_PREFETCH, async_iter_pages, async_seek_page
+from utils.parsing import async_parse, parse_guild_members, parse_history_records
+from utils.profiles import async_get_profile_info
+from utils.scheduler import MAX_LIMIT, CrawlScheduler, use_scheduler
+from utils.site import BASE_URL
+
+# Сколько страниц списка участников пробовать за раз, если у союза нет пагинации
+GUILD_PROBE_BATCH = 3
+# Сколько минут после чтения первой страницы истории игрока считать, что новых
+# матчей у него нет, и не читать её снова; переопределяется через GLEB_HISTORY_MAX_AGE
+HISTORY_MAX_AGE = int(os.environ.get("GLEB_HISTORY_MAX_AGE", "20"))
+
+# Списки участников по id союза; живут столько же, сколько свежая история
+GUILD_MEMBERS_CACHE = TTLCache(HISTORY_MAX_AGE * 60)
+_GUILD_ID_RE = re.compile(r'/guilds/(\d+)')
 
 async def async_get_nickname(page, profile_url):
-    """Получает никнейм пользователя по ссылке профиля."""
+    """Получает никнейм пользователя по ссылке профиля (через общий кэш профилей)."""
     try:
-        await page.goto(profile_url, timeout=15000, wait_until="domcontentloaded")
-        html = await page.content()
-        soup = BeautifulSoup(html, "html.parser")
-
-        title_tag = soup.find("title")
-        if title_tag:
-            title_text = title_tag.get_text(strip=True)
-            # Если заголовок начинается с "Профиль участника", убираем этот префикс
-            prefix = "Профиль участника "
-            if title_text.startswith(prefix):
-                title_text = title_text[len(prefix):]
-            # Разбиваем текст по разделителю " - " и берём первую часть
-            nickname = title_text.split(" - ")[0].strip()
-            return nickname
-
-        h1 = soup.find("h1")
-        if h1:
-            h1_text = h1.get_text(strip=True)
-            # Аналогично обрабатываем, если заголовок H1 имеет похожий формат
-            prefix = "Профиль участника "
-            if h1_text.startswith(prefix):
-                h1_text = h1_text[len(prefix):]
-            nickname = h1_text.split(" - ")[0].strip()
-            return nickname
-    except TimeoutError:
+        info = await async_get_profile_info(page, profile_url)
+    except FETCH_ERRORS:
         return profile_url.split("/")[-1]
+    return info.nickname if info.nickname is not None else profile_url.split("/")[-1]
 
-    return profile_url.split("/")[-1]
+async def async_fetch_history_page(page, user_id, page_num):
+    """
+    Загружает страницу истории и возвращает матчи как (played_at в минутах, код результата, ссылка соперника).
+    Разбор выполняется в пуле, а не в event loop.
+    """
+    history_url = f"{BASE_URL}/xml/games/history.php?page={page_num}&act=userhistory&user={user_id}"
+    html = await async_fetch_html(page, history_url)
+    return await async_parse(parse_history_records, html, user_id)
 
-async def async_collect_stats_for_profile(page, profile_url, filter_from, filter_to, computed_stats):
-    """Собирает статистику матчей профиля."""
-    user_id_match = re.search(r'/users/(\d+)', profile_url)
-    if not user_id_match:
-        return (0, 0, 0)
-    
-    user_id = user_id_match.group(1)
-    if user_id in computed_stats:
-        return computed_stats[user_id]
+async def async_fill_history_gap(page, user_id, gap_from, gap_to, store):
+    """
+    Загружает матчи игрока за непокрытый интервал [gap_from, gap_to] (в минутах).
+    Первая страница, пересекающаяся с gap_to, ищется через async_seek_page, затем
+    страницы читаются подряд с предзагрузкой нескольких следующих (через HTTP-сессию),
+    пока не встретится матч старше gap_from или не закончится история; лишние
+    предзагрузки при этом отменяются. Возвращает число новых сохранённых матчей.
 
-    wins, draws, losses = 0, 0, 0
-    page_num = 1
+    Пустая страница считается концом истории (покрытие от 0), только если и
+    повторная загрузка пуста; иначе это сбой загрузки. Сбой пробрасывается
+    вызывающему, а покрытие ограничивается уже прочитанными матчами (при сбое
+    поиска ничего не сохраняется), так что статистика не считается по неполной истории.
+    """
+    async def fetch_page(page_num):
+        return await async_fetch_history_page(page, user_id, page_num)
 
-    while True:
-        history_url = f"https://11x11.ru/xml/games/history.php?page={page_num}&act=userhistory&user={user_id}"
+    async def is_history_end(page_num):
+        """Подтверждает пустую страницу второй загрузкой; ошибка загрузки — не подтверждение."""
         try:
-            await page.goto(history_url, timeout=15000, wait_until="domcontentloaded")
-            soup = BeautifulSoup(await page.content(), "html.parser")
-            rows = soup.select("tr")
+            return not await fetch_page(page_num)
         except Exception:
-            break
+            return False
+
+    started_at = to_minutes(datetime.now())
+    page_num, rows = await async_seek_page(fetch_page, gap_to)
+    if not rows and not await is_history_end(page_num):
+        raise RuntimeError(f"history page {page_num} of user {user_id} came back empty once")
+    start_page = page_num
 
+    new_matches = []
+
+    def take(rows):
+        """Сохраняет матчи страницы; возвращает нижнюю границу покрытия, если обход пора закончить."""
         if not rows:
-            break
+            return 0
+        new_matches.extend(rows)
+        oldest = min(row[0] for row in rows)
+        if oldest < gap_from:
+            # Последняя минута страницы могла продолжаться на следующей,
+            # поэтому покрытие начинается со следующей минуты.
+            return oldest + 1
+        return None
 
-        for row in rows:
-            cols = row.select("td")
-            if len(cols) < 4:
-                continue
-            try:
-                match_date = datetime.strptime(cols[0].get_text(strip=True), "%d.%m.%Y %H:%M")
-                if match_date < filter_from:
-                    return wins, draws, losses
-                if match_date > filter_to:
-                    continue
-            except ValueError:
-                continue
+    covered_from = take(rows)
+    error = None
+    if covered_from is None:
+        prefetch = HISTORY_PREFETCH if supports_concurrent_fetch(page) else 1
+        try:
+            async with aclosing(async_iter_pages(fetch_page, start_page + 1, prefetch)) as pages:
+                async for next_page, rows in pages:
+                    if not rows and not await is_history_end(next_page):
+                        raise ValueError(f"history page {next_page} of user {user_id} came back empty once")
+                    covered_from = take(rows)
+                    if covered_from is not None:
+                        break
+        except Exception as e:
+            # Покрытие — только прочитанные матчи; недочитанная часть загрузится в следующий раз
+            error = e
+            covered_from = min(row[0] for row in new_matches) + 1
+
+    # С первой страницы известны все матчи до самого свежего из прочитанных,
+    # но не будущие; для глубже лежащих страниц граница — gap_to.
+    if start_page == 1:
+        covered_to = max((row[0] for row in new_matches), default=-1)
+    else:
+        covered_to = gap_to
+    inserted = store.save_sync(user_id, new_matches, covered_from, covered_to,
+                               checked_at=started_at if start_page == 1 else None)
+    if error is not None:
+        raise error
+    return inserted
 
-            result = "Draw"
-            center = cols[2].select_one("b a")
-            if center and user_id in center["href"]:
-                result = "Win"
-            elif center:
-                result = "Loss"
+def history_is_fresh(store, user_id, max_age=HISTORY_MAX_AGE) -> bool:
+    """
+    Читал ли фоновый WARM_CACHE первую страницу истории игрока не раньше max_age
+    минут назад. Чтения интерактивных обходов не в счёт: повторный запрос за
+    сегодня всегда дочитывает первую страницу и не теряет только что сыгранные матчи.
+    """
+    checked_at = store.checked_at(user_id, background_only=True)
+    return checked_at is not None and to_minutes(datetime.now()) - checked_at <= max_age
 
-            if result == "Win":
-                wins += 1
-            elif result == "Loss":
-                losses += 1
-            else:
-                draws += 1
+async def async_sync_history(page, user_id, filter_from, filter_to, store, max_age=HISTORY_MAX_AGE):
+    """
+    Дочитывает историю матчей игрока в локальное хранилище.
+
+    Загружаются только части окна [filter_from, filter_to], ещё не покрытые
+    хранилищем: для повторного запроса это обычно одна первая страница (матчи
+    новее отметки последнего сохранённого), а если окно уже покрыто целиком —
+    ни одной. Если первую страницу читало фоновое обновление WARM_CACHE не
+    раньше max_age минут назад, непокрытый хвост новее всех сохранённых матчей
+    считается пустым и не загружается (счётчик history_fresh_skips).
+    Возвращает число новых сохранённых матчей; сбой загрузки пробрасывается.
+    """
+    inserted = 0
+    gaps = store.missing_ranges(user_id, to_minutes(filter_from), to_minutes(filter_to))
+    if gaps and gaps[0][0] > store.covered_until(user_id) and history_is_fresh(store, user_id, max_age):
+        gaps = gaps[1:]
+        metrics.incr("history_fresh_skips")
+    metrics.incr("history_store_misses" if gaps else "history_store_hits")
+    for gap_from, gap_to in gaps:
+        inserted += await async_fill_history_gap(page, user_id, gap_from, gap_to, store)
+    return inserted
+
+async def async_collect_stats_for_profile(page, profile_url, filter_from, filter_to, computed_stats, store=None,
+                                         max_age=HISTORY_MAX_AGE):
+    """
+    Собирает статистику матчей профиля. Матчи сохраняются в store (MatchStore),
+    поэтому повторный запрос дочитывает только новые страницы истории, а подсчёт
+    за окно дат берётся из колоночного индекса MatchIndex.
+    Без store используется временное хранилище в памяти.
+    max_age — см. async_sync_history.
+    """
+    user_id_match = re.search(r'/users/(\d+)', profile_url)
+    if not user_id_match:
+        return (0, 0, 0)
+    
+    user_id = user_id_match.group(1)
+    if user_id in computed_stats:
+        metrics.incr("stats_memo_hits")
+        return computed_stats[user_id]
 
-        page_num += 1
+    if store is None:
+        with MatchStore(":memory:") as memory_store:
+            await async_sync_history(page, user_id, filter_from, filter_to, memory_store)
+            stats = memory_store.count_results(user_id, filter_from, filter_to)
+    else:
+        index = get_match_index(store)
+        await async_sync_history(page, user_id, filter_from, filter_to, store, max_age)
+        index.refresh(store, user_id)
+        stats = index.count(user_id, filter_from, filter_to)
 
-    computed_stats[user_id] = (wins, draws, losses)
-    return wins, draws, losses
+    computed_stats[user_id] = stats
+    return stats
 
-async def process_profile(context, profile_url, filter_from, filter_to, computed_stats):
-    """Создаёт новую вкладку для профиля, получает ник и статистику."""
+async def process_profile(context, profile_url, filter_from, filter_to, computed_stats, session=None, store=None, nickname=None):
+    """
+    Получает ник и статистику профиля. Если передана HTTP-сессия, страницы загружаются
+    через неё, иначе для профиля создаётся новая вкладка браузера.
+    Ник из списка участников союза (nickname) избавляет от загрузки страницы профиля.
+    """
+    if session is not None:
+        if not nickname:
+            nickname = await async_get_nickname(session, profile_url)
+        wins, draws, losses = await async_collect_stats_for_profile(session, profile_url, filter_from, filter_to, computed_stats, store)
+        return profile_url, nickname, wins, draws, losses
     page = await context.new_page()
-    nickname = await async_get_nickname(page, profile_url)
-    wins, draws, losses = await async_collect_stats_for_profile(page, profile_url, filter_from, filter_to, computed_stats)
+    if not nickname:
+        nickname = await async_get_nickname(page, profile_url)
+    wins, draws, losses = await async_collect_stats_for_profile(page, profile_url, filter_from, filter_to, computed_stats, store)
     await page.close()
     return profile_url, nickname, wins, draws, losses
 
 async def async_get_profiles_from_guild(page, guild_url):
-    """Асинхронно получает список участников союза."""
+    """
+    Асинхронно получает список участников союза.
+    Число страниц берётся из пагинации первой страницы, остальные страницы
+    загружаются одновременно (через HTTP-сессию). Если пагинации нет, следующие
+    страницы пробуются пачками по GUILD_PROBE_BATCH, пока страница не перестанет
+    добавлять новых участников. Ошибка загрузки любой страницы пробрасывается:
+    неполный список участников не возвращается (и не попадает в GUILD_MEMBERS_CACHE).
+    """
     guild_id_match = re.search(r'/guilds/(\d+)', guild_url)
     if not guild_id_match:
         return []
     guild_id = guild_id_match.group(1)
-    profiles = set()
-    page_num = 1
-    while True:
-        members_url = f"https://11x11.ru/xml/misc/guilds.php?page={page_num}&type=misc/guilds&act=members&id={guild_id}"
-        try:
-            await page.goto(members_url, timeout=15000, wait_until="domcontentloaded")
-            soup = BeautifulSoup(await page.content(), "html.parser")
-            new_profiles = { (f"https://11x11.ru{a['href']}", a.get_text(strip=True))
-                             for a in soup.select("a[href^='/users/']") }
-        except Exception:
-            break
-        if not new_profiles - profiles:
+
+    async def fetch_members(page_num):
+        members_url = f"{BASE_URL}/xml/misc/guilds.php?page={page_num}&type=misc/guilds&act=members&id={guild_id}"
+        return await async_parse(parse_guild_members, await async_fetch_html(page, members_url))
+
+    async def fetch_batch(page_nums):
+        if supports_concurrent_fetch(page):
+            return await asyncio.gather(*(fetch_members(n) for n in page_nums), return_exceptions=True)
+        batch = []
+        for n in page_nums:
+            try:
+                batch.append(await fetch_members(n))
+            except Exception as e:
+                batch.append(e)
+        return batch
+
+    profiles, last_page = await fetch_members(1)
+
+    next_page = 2
+    while profiles:
+        # Страницы до известной из пагинации последней загружаются все; дальше — проба
+        paged = last_page >= next_page
+        batch_end = last_page if paged else next_page + GUILD_PROBE_BATCH - 1
+        exhausted = False
+        results = await fetch_batch(range(next_page, batch_end + 1))
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+        for result in results:
+            if not paged and not result[0] - profiles:
+                exhausted = True
+                break
+            profiles.update(result[0])
+            last_page = max(last_page, result[1])
+        # Пагинация явно указала последнюю страницу, и она уже загружена
+        if exhausted or 1 < last_page <= batch_end:
             break
-        profiles.update(new_profiles)
-        page_num += 1
+        next_page = batch_end + 1
     return list(profiles)
 
-async def async_main(mode_choice, target_url, filter_from, filter_to, login, password):
-    """Асинхронно собирает статистику матчей."""
+async def async_get_guild_members(page, guild_url, refresh=False):
+    """
+    Список участников союза (см. async_get_profiles_from_guild) из GUILD_MEMBERS_CACHE,
+    если он загружался не раньше HISTORY_MAX_AGE минут назад, иначе (или при
+    refresh=True) — с сайта, с обновлением кэша. Ошибка загрузки пробрасывается,
+    кэш при этом не меняется.
+    """
+    match = _GUILD_ID_RE.search(guild_url)
+    cached = GUILD_MEMBERS_CACHE.get(match.group(1)) if match and not refresh else None
+    if cached is not None:
+        metrics.incr("guild_members_cache_hits")
+        return list(cached)
+    members = await async_get_profiles_from_guild(page, guild_url)
+    if match and members:
+        GUILD_MEMBERS_CACHE.set(match.group(1), members)
+    return members
+
+def profile_row(profile_url, nickname, wins, draws, losses):
+    """Строка таблицы результатов для одного профиля."""
+    return {
+        "Профиль": f'<a href="{profile_url}" target="_blank">{nickname}</a>',
+        "Побед": wins,
+        "Ничьих": draws,
+        "Поражений": losses
+    }
+
+def profile_failed(result) -> bool:
+    """Не удалось ли собрать статистику профиля (кортеж async_iter_results с None вместо результатов)."""
+    return result[2] is None
+
+def guild_totals(profiles_results):
+    """
+    (всего игроков, сыгравших за период, не сыгравших) по кортежам process_profile;
+    игроки, статистику которых собрать не удалось, входят только во «всего».
+    """
+    total_players = len(profiles_results)
+    loaded = [result for result in profiles_results if not profile_failed(result)]
+    active_count = sum(1 for (_, _, w, d, l) in loaded if (w + d + l) > 0)
+    return total_players, active_count, len(loaded) - active_count
+
+def results_table(mode_choice, profiles_results):
+    """
+    Строки таблицы результатов из кортежей process_profile; для союза добавляется
+    итоговая строка. Годится и для частичного результата во время обхода.
+    """
+    results = [profile_row(*result) for result in profiles_results]
+    if mode_choice == "Профилю" or not results:
+        return results
+    total_players, active_count, inactive_count = guild_totals(profiles_results)
+    failed_count = total_players - active_count - inactive_count
+    results.append({
+        "Профиль": f"<b>Всего игроков: {total_players}, играли: {active_count}, не играли: {inactive_count}"
+                   + (f", не загрузились: {failed_count}" if failed_count else "") + "</b>",
+        "Побед": "",
+        "Ничьих": "",
+        "Поражений": ""
+    })
+    return results
+
+async def async_iter_completed(aws):
+    """
+    Выдаёт результаты aws по мере готовности. Если генератор закрыт досрочно
+    (или одна из задач упала), оставшиеся задачи отменяются.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def async_iter_results(page, context, mode_choice, target_url, filter_from, filter_to, session=None, store=None):
+    """
+    Выдаёт результаты по профилям по мере готовности в виде (done, total, result),
+    где result — кортеж process_profile (profile_url, nickname, wins, draws, losses)
+    или None для повторного участника союза, который уже был выдан.
+    Если историю профиля загрузить не удалось, обход продолжается, а вместо
+    wins, draws, losses в кортеже стоят None (см. profile_failed).
+    page используется для списка участников союза (вкладка или HTTP-сессия).
+    """
     computed_stats = {}
-    results = []
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True, args=["--no-sandbox", "--disable-setuid-sandbox"])
-        context = await browser.new_context()
+
+    async def profile_or_failure(profile_url, nickname=None):
+        try:
+            return await process_profile(context, profile_url, filter_from, filter_to, computed_stats, session, store, nickname)
+        except Exception as e:
+            metrics.failure("failed_profiles", f"Failed to collect stats for {profile_url}: {e}")
+            return profile_url, nickname, None, None, None
+
+    if mode_choice == "Профилю":
+        yield 1, 1, await profile_or_failure(target_url)
+        return
+
+    profile_tuples = await async_get_guild_members(page, target_url)
+    # Темп запросов задаёт текущий CrawlScheduler; в режиме браузера семафор
+    # лишь ограничивает число одновременно открытых вкладок
+    tabs = asyncio.Semaphore(MAX_LIMIT if session is None else max(1, len(profile_tuples)))
+    async def sem_process(profile_url, nickname):
+        async with tabs:
+            with metrics.timed_member(profile_url):
+                return await profile_or_failure(profile_url, nickname)
+
+    seen_ids = set()
+    total = len(profile_tuples)
+    tasks = (sem_process(profile_url, nickname) for (profile_url, nickname) in profile_tuples)
+    async with aclosing(async_iter_completed(tasks)) as completed:
+        done = 0
+        async for result in completed:
+            done += 1
+            match = re.search(r'/users/(\d+)', result[0])
+            if not match or match.group(1) in seen_ids:
+                yield done, total, None
+                continue
+            seen_ids.add(match.group(1))
+            yield done, total, result
+
+async def async_collect_results(page, context, mode_choice, target_url, filter_from, filter_to, session=None, store=None):
+    """Собирает строки таблицы результатов для профиля или союза целиком (см. async_iter_results)."""
+    profiles_results = []
+    async with aclosing(async_iter_results(page, context, mode_choice, target_url, filter_from, filter_to, session, store)) as results:
+        async for _, _, result in results:
+            if result is not None:
+                profiles_results.append(result)
+    return results_table(mode_choice, profiles_results)
+
+async def async_iter_main(mode_choice, target_url, filter_from, filter_to, login, password, use_http=True):
+    """
+    Асинхронно собирает статистику матчей и выдаёт результаты по профилям по мере
+    готовности — те же (done, total, result), что и async_iter_results.
+    Авторизованный контекст берётся из общего для процесса BROWSER_POOL.
+    При use_http=True браузер нужен только для входа: cookies сессии переносятся
+    в пул HTTP-соединений, и все страницы истории и союза загружаются без рендера.
+    Разобранные матчи сохраняются в локальную базу (MatchStore), так что повторные
+    запросы дочитывают только новые страницы истории. Число одновременных
+    запросов и повторы регулирует CrawlScheduler.
+    Генератор нужно закрывать в той же задаче, где он читается (async with aclosing(...)).
+    """
+    login_session = await BROWSER_POOL.acquire(login, password)
+    context = login_session.context
+    with MatchStore() as store, use_scheduler(CrawlScheduler()):
+        if use_http:
+            async with await create_http_session(context, login_session.user_agent) as session:
+                async with aclosing(async_iter_results(session, None, mode_choice, target_url, filter_from, filter_to, session, store)) as results:
+                    async for item in results:
+                        yield item
+            return
         page = await context.new_page()
+        try:
+            async with aclosing(async_iter_results(page, context, mode_choice, target_url, filter_from, filter_to, store=store)) as results:
+                async for item in results:
+                    yield item
+        finally:
+            await page.close()
 
-        # Авторизация
-        await page.goto("https://11x11.ru/", timeout=15000, wait_until="domcontentloaded")
-        await page.fill("input[name='auth_name']", login)
-        await page.fill("input[name='auth_pass1']", password)
-        await page.click("xpath=//input[@type='submit' and @value='Войти']")
-        await page.wait_for_selector("xpath=//a[contains(text(), 'Выход')]", timeout=15000)
-
-        if mode_choice == "Профилю":
-            profile_url, nickname, wins, draws, losses = await process_profile(context, target_url, filter_from, filter_to, computed_stats)
-            results.append({
-                "Профиль": f'<a href="{profile_url}" target="_blank">{nickname}</a>',
-                "Побед": wins,
-                "Ничьих": draws,
-                "Поражений": losses
-            })
-        else:
-            profile_tuples = await async_get_profiles_from_guild(page, target_url)
-            if not profile_tuples:
-                await page.close()
-                await context.close()
-                await browser.close()
-                return []
-            semaphore = asyncio.Semaphore(10)
-            async def sem_process(profile_url):
-                async with semaphore:
-                    return await process_profile(context, profile_url, filter_from, filter_to, computed_stats)
-            tasks = [sem_process(profile_url) for (profile_url, _) in profile_tuples]
-            profiles_results = await asyncio.gather(*tasks)
-            dedup = { re.search(r'/users/(\d+)', pr[0]).group(1): pr for pr in profiles_results if re.search(r'/users/\d+', pr[0]) }
-            profiles_results = dedup.values()
-            total_players = len(profiles_results)
-            active_count = sum(1 for (_, _, w, d, l) in profiles_results if (w + d + l) > 0)
-            inactive_count = total_players - active_count
-            for profile_url, nickname, wins, draws, losses in profiles_results:
-                results.append({
-                    "Профиль": f'<a href="{profile_url}" target="_blank">{nickname}</a>',
-                    "Побед": wins,
-                    "Ничьих": draws,
-                    "Поражений": losses
-                })
-            results.append({
-                "Профиль": f"<b>Всего игроков: {total_players}, играли: {active_count}, не играли: {inactive_count}</b>",
-                "Побед": "",
-                "Ничьих": "",
-                "Поражений": ""
-            })
-        await page.close()
-        await context.close()
-        await browser.close()
-    return results
+async def async_main(mode_choice, target_url, filter_from, filter_to, login, password, use_http=True):
+    """Собирает статистику матчей целиком и возвращает строки таблицы (см. async_iter_main)."""
+    profiles_results = []
+    async with aclosing(async_iter_main(mode_choice, target_url, filter_from, filter_to, login, password, use_http)) as results:
+        async for _, _, result in results:
+            if result is not None:
+                profiles_results.append(result)
+    return results_table(mode_choice, profiles_results)
@@ -0,0 +1,88 @@
+import asyncio
+import re
+import aiohttp
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from utils import metrics
+from utils.scheduler import MAX_LIMIT, current_scheduler
+
+# Размер пула keep-alive соединений (не меньше верхнего лимита планировщика)
+# и таймаут одного HTTP-запроса (секунды)
+HTTP_POOL_SIZE = MAX_LIMIT
+HTTP_TIMEOUT = 15
+
+# Ошибки загрузки страницы, общие для браузерной вкладки и HTTP-сессии
+FETCH_ERRORS = (PlaywrightTimeoutError, asyncio.TimeoutError, aiohttp.ClientError)
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+async def create_http_session(context, user_agent=None, pool_size=HTTP_POOL_SIZE):
+    """
+    Переносит cookies авторизованного контекста Playwright в aiohttp-сессию
+    с пулом keep-alive соединений. User-Agent браузера передаётся, чтобы сервер
+    видел тот же клиент, что и при входе.
+    """
+    cookies = {c["name"]: c["value"] for c in await context.cookies()}
+    headers = {}
+    if user_agent:
+        headers["User-Agent"] = user_agent
+    connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=30)
+    return aiohttp.ClientSession(
+        connector=connector,
+        cookies=cookies,
+        headers=headers,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+    )
+
+
+def supports_concurrent_fetch(source) -> bool:
+    """HTTP-сессия допускает параллельные запросы; одна вкладка браузера — нет."""
+    return isinstance(source, aiohttp.ClientSession)
+
+
+def decode_html(body: bytes, charset=None) -> str:
+    """Декодирует ответ по заголовку Content-Type, затем по <meta charset>, иначе как UTF-8."""
+    if not charset:
+        meta = _META_CHARSET_RE.search(body[:2048])
+        charset = meta.group(1).decode("ascii") if meta else "utf-8"
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def is_retryable(exc) -> bool:
+    """Ответы 4xx (кроме 429) повтор не исправит; сетевые ошибки и 5xx — возможно."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status == 429 or exc.status >= 500
+    return True
+
+
+async def async_fetch_html(source, url, timeout=15000):
+    """
+    Возвращает HTML страницы. source — либо aiohttp-сессия (быстрый путь без рендера),
+    либо вкладка Playwright. Если задан текущий CrawlScheduler, загрузка идёт
+    в его слоте с повторами и паузами между ними.
+    """
+    scheduler = current_scheduler.get()
+    if scheduler is None:
+        return await _fetch_once(source, url, timeout)
+    return await scheduler.run(lambda: _fetch_once(source, url, timeout), is_retryable=is_retryable)
+
+
+async def _fetch_once(source, url, timeout):
+    if isinstance(source, aiohttp.ClientSession):
+        with metrics.timed("http_get"):
+            async with source.get(url) as resp:
+                resp.raise_for_status()
+                body = await resp.read()
+        metrics.incr("pages")
+        metrics.incr("bytes", len(body))
+        return decode_html(body, resp.charset)
+    with metrics.timed("goto"):
+        await source.goto(url, timeout=timeout, wait_until="domcontentloaded")
+    with metrics.timed("content"):
+        html = await source.content()
+    metrics.incr("pages")
+    metrics.incr("bytes", len(html.encode("utf-8")))
+    return html
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from contextlib import aclosing
+from utils.metrics import CrawlMetrics, use_metrics
+from utils.runtime import RUNTIME
+
+# Сколько секунд хранить результат завершённого обхода для повторного показа
+JOB_RESULT_TTL = int(os.environ.get("GLEB_JOB_TTL", "600"))
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class CrawlJob:
+    """
+    Фоновый обход: копит всё, что выдаёт асинхронный генератор обхода
+    (например, (done, total, result) из async_iter_main), его статус и метрики
+    (CrawlMetrics), которые после завершения дописываются в METRICS_LOG.
+    Пишет в объект только loop рантайма; страницы читают его через snapshot().
+    """
+
+    def __init__(self, key, label=None):
+        self.key = key
+        self.metrics = CrawlMetrics(label or str(key))
+        self.status = JOB_PENDING
+        self.items = []
+        self.error = None
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def snapshot(self):
+        """Возвращает (status, копия items, error) на текущий момент."""
+        with self._lock:
+            return self.status, list(self.items), self.error
+
+    def _add(self, item):
+        with self._lock:
+            self.items.append(item)
+
+    def _finish(self, status, error=None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.monotonic()
+
+
+class JobQueue:
+    """
+    Очередь фоновых обходов с дедупликацией по ключу. Пока обход с тем же ключом
+    (режим, URL, окно дат) выполняется или его результат моложе ttl секунд,
+    submit возвращает тот же CrawlJob — все сессии Streamlit видят одну работу,
+    а сайт не обходится повторно. Упавший обход остаётся виден через get (с ошибкой),
+    а при следующем submit запускается заново.
+    """
+
+    def __init__(self, ttl=JOB_RESULT_TTL, runtime=RUNTIME):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._runtime = runtime
+
+    def _purge(self):
+        now = time.monotonic()
+        for key, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at >= self.ttl:
+                del self._jobs[key]
+
+    def get(self, key):
+        """Возвращает выполняющийся или ещё не устаревший обход с этим ключом либо None."""
+        with self._lock:
+            self._purge()
+            return self._jobs.get(key)
+
+    def running(self) -> int:
+        """Число обходов, которые ещё не завершились."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def submit(self, key, make_iter, label=None):
+        """
+        Возвращает обход с ключом key, запуская его при необходимости.
+        make_iter() создаёт асинхронный генератор обхода; он выполняется в общем
+        loop рантайма (параллельно с другими обходами), а выданные элементы копятся в job.items.
+        label — подпись обхода в метриках (по умолчанию ключ).
+        """
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(key)
+            if job is None or job.status == JOB_FAILED:
+                job = CrawlJob(key, label)
+                self._jobs[key] = job
+                self._runtime.submit(self._async_run(job, make_iter))
+            return job
+
+    @staticmethod
+    async def _async_run(job, make_iter):
+        job.status = JOB_RUNNING
+        try:
+            with use_metrics(job.metrics):
+                async with aclosing(make_iter()) as items:
+                    async for item in items:
+                        job._add(item)
+        except Exception as e:
+            job.metrics.failure("failed_jobs", f"Crawl job {job.key} failed: {e}")
+            status, error = JOB_FAILED, e
+        else:
+            status, error = JOB_DONE, None
+        job.metrics.finish()
+        job._finish(status, error)
+        job.metrics.export()
+
+# Общая для всех сессий Streamlit очередь обходов
+JOB_QUEUE = JobQueue()
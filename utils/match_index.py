@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+from utils.match_store import RESULT_DRAW, RESULT_LOSS, RESULT_WIN, to_minutes
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class UserMatches:
+    """
+    Колоночное представление матчей одного игрока: отсортированные минуты (int32)
+    и коды результата (int8), плюс префиксные суммы побед/ничьих/поражений —
+    по матчам и по суткам.
+    """
+
+    __slots__ = ("minutes", "results", "match_prefix", "first_day", "day_prefix")
+
+    def __init__(self, minutes, results):
+        minutes = np.asarray(minutes, dtype=np.int32)
+        results = np.asarray(results, dtype=np.int8)
+        order = np.argsort(minutes, kind="stable")
+        self.minutes = minutes[order]
+        self.results = results[order]
+
+        # match_prefix[k] — (W, D, L) среди первых k матчей
+        counts = np.stack(
+            [self.results == RESULT_WIN, self.results == RESULT_DRAW, self.results == RESULT_LOSS], axis=1
+        ).astype(np.int32)
+        self.match_prefix = np.vstack([np.zeros((1, 3), dtype=np.int32), np.cumsum(counts, axis=0, dtype=np.int32)])
+
+        # day_prefix[k] — (W, D, L) среди матчей, сыгранных до суток first_day + k
+        if len(self.minutes):
+            self.first_day = int(self.minutes[0]) // MINUTES_PER_DAY
+            last_day = int(self.minutes[-1]) // MINUTES_PER_DAY
+        else:
+            self.first_day = last_day = 0
+        boundaries = (self.first_day + np.arange(last_day - self.first_day + 2, dtype=np.int64)) * MINUTES_PER_DAY
+        self.day_prefix = self.match_prefix[np.searchsorted(self.minutes, boundaries, side="left")]
+
+    def count(self, from_minute: int, to_minute: int) -> tuple:
+        """(W, D, L) за интервал [from_minute, to_minute] включительно."""
+        if from_minute % MINUTES_PER_DAY == 0 and (to_minute + 1) % MINUTES_PER_DAY == 0:
+            # Интервал из целых суток (режим «День» и интервалы 00:00–23:59) — O(1) по суточным суммам
+            last = len(self.day_prefix) - 1
+            lo = min(max(from_minute // MINUTES_PER_DAY - self.first_day, 0), last)
+            hi = min(max((to_minute + 1) // MINUTES_PER_DAY - self.first_day, 0), last)
+            counts = self.day_prefix[hi] - self.day_prefix[lo]
+        else:
+            lo = np.searchsorted(self.minutes, from_minute, side="left")
+            hi = np.searchsorted(self.minutes, to_minute, side="right")
+            counts = self.match_prefix[hi] - self.match_prefix[lo]
+        return tuple(int(c) for c in counts) if hi > lo else (0, 0, 0)
+
+
+class MatchIndex:
+    """
+    Индекс матчей в памяти процесса поверх MatchStore. Переживает перезапуски
+    скрипта Streamlit, поэтому запрос по любому окну дат для уже обойдённых игроков
+    отвечается без разбора страниц; к базе идёт лишь проверка версии игрока
+    (MatchStore.match_version), так что матчи, записанные другим процессом
+    (пакетный обход, шард, фоновое обновление), не теряются.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def load(self, store, user_id: str):
+        """Перестраивает колонки игрока по содержимому хранилища."""
+        minutes, results = store.load_matches(user_id)
+        entry = UserMatches(minutes, results)
+        # Версия считается по прочитанным строкам, а не отдельным запросом:
+        # вставка между двумя запросами не должна дать версию новее колонок
+        version = (len(minutes), minutes[-1] if minutes else None)
+        with self._lock:
+            self._users[user_id] = entry
+            self._versions[user_id] = version
+        return entry
+
+    def has(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def refresh(self, store, user_id: str):
+        """Перечитывает игрока из хранилища, если его версия там изменилась (или игрока нет в индексе)."""
+        if self._versions.get(user_id) != store.match_version(user_id):
+            self.load(store, user_id)
+
+    def count(self, user_id: str, filter_from, filter_to) -> tuple:
+        """(W, D, L) игрока за окно дат; (0, 0, 0), если игрок не загружен в индекс."""
+        entry = self._users.get(user_id)
+        if entry is None:
+            return (0, 0, 0)
+        return entry.count(to_minutes(filter_from), to_minutes(filter_to))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_match_index(store) -> MatchIndex:
+    """Возвращает общий для процесса индекс, привязанный к файлу базы store."""
+    with _indexes_lock:
+        if store.path not in _indexes:
+            _indexes[store.path] = MatchIndex()
+        return _indexes[store.path]
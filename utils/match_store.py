@@ -0,0 +1,182 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+# Файл базы по умолчанию: <корень проекта>/data/matches.sqlite3, переопределяется через GLEB_DB_PATH
+DB_PATH = os.environ.get(
+    "GLEB_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "matches.sqlite3"),
+)
+
+# Коды результата матча с точки зрения игрока
+RESULT_LOSS, RESULT_DRAW, RESULT_WIN = -1, 0, 1
+RESULT_CODES = {"Win": RESULT_WIN, "Draw": RESULT_DRAW, "Loss": RESULT_LOSS}
+
+_EPOCH = datetime(1970, 1, 1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    user_id TEXT NOT NULL,
+    played_at INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    opponent_url TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, played_at, opponent_url, result)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    user_id TEXT NOT NULL,
+    covered_from INTEGER NOT NULL,
+    covered_to INTEGER NOT NULL,
+    PRIMARY KEY (user_id, covered_from)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history_checks (
+    user_id TEXT PRIMARY KEY,
+    checked_at INTEGER NOT NULL,
+    background INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+def to_minutes(dt: datetime) -> int:
+    """Переводит дату матча (время сайта, без часового пояса) в минуты от 01.01.1970."""
+    return (dt - _EPOCH) // timedelta(minutes=1)
+
+
+def from_minutes(minutes: int) -> datetime:
+    return _EPOCH + timedelta(minutes=minutes)
+
+
+class MatchStore:
+    """
+    Локальное хранилище разобранных матчей по user_id.
+
+    Для каждого игрока хранится набор непересекающихся покрытых интервалов
+    [covered_from, covered_to] (в минутах): все его матчи внутри них уже лежат
+    в таблице matches. Верхняя граница последнего интервала — отметка самого
+    свежего сохранённого матча; интервал, начинающийся с 0, означает, что
+    история прочитана до самого начала. В history_checks хранится, когда
+    (по часам сервера, в минутах) последний раз читалась первая страница
+    истории: до этого момента новее сохранённых матчей у игрока не было, —
+    и было ли это чтение фоновым (хранилище открыто с background=True).
+    """
+
+    def __init__(self, path: str = DB_PATH, background: bool = False):
+        self.path = path
+        self.background = background
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Запас по ожиданию блокировки: в базу могут писать несколько процессов-шардов
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def missing_ranges(self, user_id: str, range_from: int, range_to: int) -> list:
+        """
+        Возвращает непокрытые части интервала [range_from, range_to] как список
+        (gap_from, gap_to), начиная с самой свежей.
+        """
+        rows = self.conn.execute(
+            "SELECT covered_from, covered_to FROM coverage "
+            "WHERE user_id = ? AND covered_to >= ? AND covered_from <= ? ORDER BY covered_from",
+            (user_id, range_from, range_to),
+        ).fetchall()
+        gaps = []
+        cursor = range_from
+        for covered_from, covered_to in rows:
+            if covered_from > cursor:
+                gaps.append((cursor, covered_from - 1))
+            cursor = max(cursor, covered_to + 1)
+        if cursor <= range_to:
+            gaps.append((cursor, range_to))
+        return gaps[::-1]
+
+    def covered_until(self, user_id: str) -> int:
+        """Верхняя граница самого свежего покрытого интервала игрока (в минутах) или -1."""
+        covered_to = self.conn.execute(
+            "SELECT MAX(covered_to) FROM coverage WHERE user_id = ?", (user_id,)
+        ).fetchone()[0]
+        return -1 if covered_to is None else covered_to
+
+    def checked_at(self, user_id: str, background_only: bool = False):
+        """
+        Когда последний раз читалась первая страница истории игрока (минуты) или None;
+        с background_only=True — только если последнее чтение было фоновым.
+        """
+        row = self.conn.execute(
+            "SELECT checked_at, background FROM history_checks WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None or (background_only and not row[1]):
+            return None
+        return row[0]
+
+    def save_sync(self, user_id: str, matches, covered_from: int, covered_to: int, checked_at: int = None):
+        """
+        Сохраняет новые матчи (played_at в минутах, код результата, ссылка соперника)
+        и добавляет покрытый интервал, сливая его с соседними, одной транзакцией.
+        checked_at — время чтения первой страницы истории, если она читалась
+        (с отметкой background этого хранилища). Возвращает число новых строк.
+        """
+        with self.conn:
+            if checked_at is not None:
+                self.conn.execute(
+                    "INSERT INTO history_checks (user_id, checked_at, background) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET checked_at = MAX(checked_at, excluded.checked_at), "
+                    "background = CASE WHEN excluded.checked_at >= checked_at THEN excluded.background ELSE background END",
+                    (user_id, checked_at, self.background),
+                )
+            inserted = self.conn.executemany(
+                "INSERT OR IGNORE INTO matches (user_id, played_at, result, opponent_url) VALUES (?, ?, ?, ?)",
+                ((user_id, played_at, result, opponent_url or "") for played_at, result, opponent_url in matches),
+            )
+            if covered_from <= covered_to:
+                merged_from, merged_to = self.conn.execute(
+                    "SELECT MIN(covered_from), MAX(covered_to) FROM coverage "
+                    "WHERE user_id = ? AND covered_to >= ? AND covered_from <= ?",
+                    (user_id, covered_from - 1, covered_to + 1),
+                ).fetchone()
+                self.conn.execute(
+                    "DELETE FROM coverage WHERE user_id = ? AND covered_to >= ? AND covered_from <= ?",
+                    (user_id, covered_from - 1, covered_to + 1),
+                )
+                self.conn.execute(
+                    "INSERT INTO coverage (user_id, covered_from, covered_to) VALUES (?, ?, ?)",
+                    (
+                        user_id,
+                        covered_from if merged_from is None else min(merged_from, covered_from),
+                        covered_to if merged_to is None else max(merged_to, covered_to),
+                    ),
+                )
+        return max(inserted.rowcount, 0)
+
+    def load_matches(self, user_id: str):
+        """Возвращает колонки (played_at, result) всех сохранённых матчей игрока по возрастанию времени."""
+        rows = self.conn.execute(
+            "SELECT played_at, result FROM matches WHERE user_id = ? ORDER BY played_at", (user_id,)
+        ).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+    def match_version(self, user_id: str) -> tuple:
+        """
+        (число, время самого свежего) сохранённых матчей игрока. Матчи только
+        добавляются, поэтому версия меняется с каждой вставкой — в том числе из
+        другого процесса, пишущего в тот же файл.
+        """
+        count, newest = self.conn.execute(
+            "SELECT COUNT(*), MAX(played_at) FROM matches WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return count, newest
+
+    def count_results(self, user_id: str, filter_from: datetime, filter_to: datetime) -> tuple:
+        """Возвращает (wins, draws, losses) игрока за интервал по сохранённым матчам."""
+        counts = dict(self.conn.execute(
+            "SELECT result, COUNT(*) FROM matches WHERE user_id = ? AND played_at BETWEEN ? AND ? GROUP BY result",
+            (user_id, to_minutes(filter_from), to_minutes(filter_to)),
+        ).fetchall())
+        return counts.get(RESULT_WIN, 0), counts.get(RESULT_DRAW, 0), counts.get(RESULT_LOSS, 0)
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+# Файл, в который дописывается по строке JSON на каждый обход; переопределяется через GLEB_METRICS_LOG
+METRICS_LOG = os.environ.get(
+    "GLEB_METRICS_LOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "metrics.jsonl"),
+)
+# Границы корзин гистограмм задержек (секунды); последняя корзина — всё, что дольше
+HISTOGRAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Сколько самых долгих участников попадает в экспорт
+SLOWEST_MEMBERS = 20
+# Сколько последних сбоев обхода попадает в экспорт
+RECENT_FAILURES = 50
+
+logger = logging.getLogger(__name__)
+
+# Метрики текущего обхода; задачи asyncio наследуют их из контекста
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+class CrawlMetrics:
+    """
+    Метрики одного обхода: счётчики (повторы, байты, попадания в кэши),
+    задержки по операциям (goto, content, http_get, parse:<функция>), время
+    обработки каждого участника и последние сбои. Пишутся только из event loop обхода.
+    """
+
+    def __init__(self, label=""):
+        self.label = label
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.elapsed = None
+        self.counters = {}
+        self.timings = {}
+        self.members = {}
+        self.failures = []
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def failure(self, name, message):
+        """Учитывает сбой: счётчик name, запись в журнал с меткой обхода и в экспорт."""
+        self.incr(name)
+        logger.warning("[%s] %s", self.label, message)
+        self.failures = (self.failures + [{"counter": name, "message": message}])[-RECENT_FAILURES:]
+
+    def observe(self, name, seconds):
+        self.timings.setdefault(name, []).append(seconds)
+
+    def member(self, profile_url, seconds):
+        self.members[profile_url] = self.members.get(profile_url, 0.0) + seconds
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._started
+
+    def merge(self, data):
+        """Добавляет метрики, выгруженные to_dict(raw=True) в другом процессе (шарде)."""
+        for name, value in data["counters"].items():
+            self.incr(name, value)
+        for name, samples in data["samples"].items():
+            self.timings.setdefault(name, []).extend(samples)
+        for profile_url, seconds in data["member_seconds"].items():
+            self.member(profile_url, seconds)
+        self.failures = (self.failures + data["failures"])[-RECENT_FAILURES:]
+
+    def histogram(self, name):
+        """Сводка по операции: число, сумма, p50/p95/максимум и счётчики по HISTOGRAM_BUCKETS."""
+        samples = sorted(self.timings.get(name, ()))
+        buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        bound = 0
+        for sample in samples:
+            while bound < len(HISTOGRAM_BUCKETS) and sample > HISTOGRAM_BUCKETS[bound]:
+                bound += 1
+            buckets[bound] += 1
+        return {
+            "count": len(samples),
+            "sum": sum(samples),
+            "p50": _percentile(samples, 0.5),
+            "p95": _percentile(samples, 0.95),
+            "max": samples[-1] if samples else 0.0,
+            "buckets": buckets,
+        }
+
+    def slowest_members(self, limit=SLOWEST_MEMBERS):
+        return sorted(self.members.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def to_dict(self, raw=False):
+        """Структура для экспорта; raw=True — с исходными замерами (для merge)."""
+        data = {
+            "label": self.label,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "elapsed": self.elapsed if self.elapsed is not None else time.perf_counter() - self._started,
+            "counters": dict(self.counters),
+            "histograms": {name: self.histogram(name) for name in self.timings},
+            "histogram_buckets": list(HISTOGRAM_BUCKETS),
+            "members": len(self.members),
+            "slowest_members": self.slowest_members(),
+            "failures": list(self.failures),
+        }
+        if raw:
+            data["samples"] = {name: list(samples) for name, samples in self.timings.items()}
+            data["member_seconds"] = dict(self.members)
+        return data
+
+    def export(self, path=METRICS_LOG):
+        """Дописывает метрики обхода строкой JSON в path."""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Failed to export crawl metrics to {path}: {e}")
+
+
+@contextmanager
+def use_metrics(metrics):
+    """Делает metrics текущими для всех загрузок и разборов внутри блока (и задач, созданных в нём)."""
+    token = current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        current_metrics.reset(token)
+
+
+def incr(name, value=1):
+    """Увеличивает счётчик текущего обхода; без метрик ничего не делает."""
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.incr(name, value)
+
+
+def failure(name, message):
+    """Учитывает сбой в текущем обходе (см. CrawlMetrics.failure); без метрик — только пишет в журнал."""
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.failure(name, message)
+    else:
+        logger.warning(message)
+
+
+@contextmanager
+def timed_member(profile_url):
+    """Добавляет длительность блока ко времени участника profile_url в текущем обходе."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.member(profile_url, time.perf_counter() - started)
+
+
+@contextmanager
+def timed(name):
+    """Замеряет блок как операцию name текущего обхода; без метрик — только выполняет блок."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - started)
@@ -0,0 +1,40 @@
+import streamlit as st
+from utils.startup import lazy_import
+
+
+def render_metrics_panel(crawl_metrics, key):
+    """
+    Необязательная панель «Производительность обхода» в боковой панели: включается
+    флажком и показывает счётчики, задержки по операциям, самых долгих участников
+    и последние сбои последнего обхода. key различает флажки страниц, открытых одновременно.
+    """
+    if not st.sidebar.checkbox("Показывать метрики обхода", key=f"metrics_panel_{key}"):
+        return
+    pd = lazy_import("pandas")
+    data = crawl_metrics.to_dict()
+    counters = data["counters"]
+    with st.sidebar.expander("Производительность обхода", expanded=True):
+        st.caption(f"{data['label']} — {data['elapsed']:.1f} с, участников: {data['members']}")
+        pages = counters.get("pages", 0)
+        st.markdown(
+            f"Страниц: **{pages}** ({pages / data['elapsed'] if data['elapsed'] else 0:.1f}/с), "
+            f"{counters.get('bytes', 0) / 2 ** 20:.1f} МБ  \n"
+            f"Повторов: **{counters.get('retries', 0)}**, неудачных запросов: {counters.get('failed_requests', 0)}  \n"
+            f"Кэш профилей: {counters.get('profile_cache_hits', 0)} попаданий / "
+            f"{counters.get('profile_cache_misses', 0)} промахов  \n"
+            f"История из базы: {counters.get('history_store_hits', 0)} без загрузки / "
+            f"{counters.get('history_store_misses', 0)} с дозагрузкой"
+        )
+        if data["histograms"]:
+            histograms = pd.DataFrame([
+                {"операция": name, "число": h["count"], "всего, с": round(h["sum"], 2),
+                 "p50, мс": round(h["p50"] * 1000), "p95, мс": round(h["p95"] * 1000), "max, мс": round(h["max"] * 1000)}
+                for name, h in data["histograms"].items()
+            ])
+            st.dataframe(histograms, hide_index=True)
+        if data["slowest_members"]:
+            slowest = pd.DataFrame(data["slowest_members"], columns=["участник", "с"]).round({"с": 2})
+            st.dataframe(slowest, hide_index=True)
+        if data["failures"]:
+            failures = pd.DataFrame(data["failures"]).rename(columns={"counter": "счётчик", "message": "сбой"})
+            st.dataframe(failures, hide_index=True)
@@ -0,0 +1,67 @@
+import asyncio
+from collections import deque
+
+# Сколько страниц истории загружается наперёд, пока разбирается текущая
+HISTORY_PREFETCH = 4
+
+
+async def async_seek_page(fetch_page, target: int):
+    """
+    Находит первую страницу истории, где есть матч не позже target (в минутах).
+
+    Страницы истории упорядочены от новых матчей к старым, поэтому условие
+    «страница пуста или её самый старый матч <= target» монотонно по номеру
+    страницы. Сначала номер удваивается (1, 2, 4, ...), пока условие не выполнится,
+    затем граница уточняется двоичным поиском — O(log N) загрузок вместо N.
+
+    fetch_page(page_num) возвращает список (played_at, result, opponent_url).
+    Возвращает (page_num, rows) найденной страницы; rows пуст, если таких
+    матчей нет и страница лежит за концом истории. Пустая страница здесь не
+    проверяется: вызывающий должен подтвердить конец истории повторной загрузкой
+    (случайно пустая страница по пути поиска к неверному непустому ответу не ведёт).
+    """
+    fetched = {}
+
+    async def reaches_target(page_num):
+        rows = fetched[page_num] = await fetch_page(page_num)
+        return not rows or min(row[0] for row in rows) <= target
+
+    if await reaches_target(1):
+        return 1, fetched[1]
+
+    # Экспоненциальная проба: страница lo целиком новее target, страница hi — уже нет
+    lo, hi = 1, 2
+    while not await reaches_target(hi):
+        lo, hi = hi, hi * 2
+
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if await reaches_target(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi, fetched[hi]
+
+
+async def async_iter_pages(fetch_page, first_page: int, prefetch: int = HISTORY_PREFETCH):
+    """
+    Асинхронный генератор (page_num, rows) по порядку начиная с first_page.
+    Держит до prefetch загрузок страниц в полёте впереди потребителя, так что
+    сеть не простаивает, пока разбирается текущая страница. Когда потребитель
+    прекращает обход (break / закрытие генератора), незавершённые загрузки
+    отменяются. Генератор бесконечен — конец истории определяет потребитель.
+    """
+    pending = deque()
+    next_page = first_page
+    try:
+        while True:
+            while len(pending) < max(prefetch, 1):
+                pending.append((next_page, asyncio.ensure_future(fetch_page(next_page))))
+                next_page += 1
+            page_num, task = pending.popleft()
+            yield page_num, await task
+    finally:
+        tasks = [task for _, task in pending]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
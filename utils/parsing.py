@@ -0,0 +1,290 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from bs4 import BeautifulSoup
+from utils import metrics
+from utils.match_store import RESULT_CODES, to_minutes
+from utils.site import BASE_URL
+
+try:
+    import lxml.html
+except ImportError:  # без lxml остаётся только встроенный html.parser
+    lxml = None
+
+# Бэкенд разбора: "lxml" (быстрый, выборочный) или "bs4" (BeautifulSoup + html.parser).
+# По умолчанию lxml, если он установлен; переопределяется через GLEB_PARSER.
+PARSER_BACKEND = os.environ.get("GLEB_PARSER", "lxml" if lxml is not None else "bs4")
+
+# Где разбирать страницы, чтобы не блокировать event loop с вкладками и запросами:
+# "process" — пул процессов (масштабируется по ядрам), "thread" — пул потоков,
+# "inline" — прямо в loop. Размер пула — GLEB_PARSE_WORKERS (по умолчанию до 4).
+PARSE_POOL = os.environ.get("GLEB_PARSE_POOL", "process")
+PARSE_WORKERS = int(os.environ.get("GLEB_PARSE_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+POWER_LABEL_RE = re.compile(r"Сила\s*11\s*лучших", re.IGNORECASE)
+PLAYERS_HEADER_RE = re.compile(r"Игроки\s+команды", re.IGNORECASE)
+PROFILE_TITLE_PREFIX = "Профиль участника "
+
+_PAGE_PARAM_RE = re.compile(r'[?&]page=(\d+)')
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+def _text(element):
+    """Аналог get_text(strip=True) из BeautifulSoup для элемента lxml."""
+    return "".join(part.strip() for part in element.itertext())
+
+
+def _single_string(element):
+    """Аналог .string из BeautifulSoup: текст элемента, если он — единственный потомок."""
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and not element.text and not element[0].tail:
+        return _single_string(element[0])
+    return None
+
+
+def _lxml_root(html):
+    # lxml не принимает str с XML-декларацией кодировки (страницы из /xml/ могут её содержать)
+    return lxml.html.fromstring(_XML_DECLARATION_RE.sub("", html, count=1) or "<html></html>")
+
+
+def _parse_match_date(text):
+    """Быстрый разбор "ДД.ММ.ГГГГ ЧЧ:ММ" без strptime; ValueError при другом формате."""
+    if len(text) == 16 and text[2] == "." and text[5] == "." and text[10] == " " and text[13] == ":":
+        return datetime(int(text[6:10]), int(text[3:5]), int(text[0:2]), int(text[11:13]), int(text[14:16]))
+    return datetime.strptime(text, "%d.%m.%Y %H:%M")
+
+
+def parse_history_rows_bs4(html, user_id):
+    """
+    Разбирает страницу истории матчей в список (match_date, result, opponent_url),
+    упорядоченный от новых матчей к старым.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    matches = []
+    for row in soup.select("tr"):
+        cols = row.select("td")
+        if len(cols) < 4:
+            continue
+        try:
+            match_date = datetime.strptime(cols[0].get_text(strip=True), "%d.%m.%Y %H:%M")
+        except ValueError:
+            continue
+
+        result = "Draw"
+        center = cols[2].select_one("b a")
+        if center and user_id in center["href"]:
+            result = "Win"
+        elif center:
+            result = "Loss"
+
+        opponent_url = ""
+        for link in row.select("a[href^='/users/']"):
+            if user_id not in link["href"]:
+                opponent_url = f"{BASE_URL}{link['href']}"
+                break
+        matches.append((match_date, result, opponent_url))
+    return matches
+
+
+def parse_history_rows_lxml(html, user_id):
+    """То же, что parse_history_rows_bs4, но через lxml: обходятся только строки и ячейки таблицы."""
+    matches = []
+    for row in _lxml_root(html).iter("tr"):
+        cols = list(row.iter("td"))
+        if len(cols) < 4:
+            continue
+        try:
+            match_date = _parse_match_date(_text(cols[0]))
+        except ValueError:
+            continue
+
+        result = "Draw"
+        center = cols[2].xpath(".//b//a[@href]")
+        if center and user_id in center[0].get("href"):
+            result = "Win"
+        elif center:
+            result = "Loss"
+
+        opponent_url = ""
+        for link in row.xpath(".//a[starts-with(@href, '/users/')]"):
+            if user_id not in link.get("href"):
+                opponent_url = f"{BASE_URL}{link.get('href')}"
+                break
+        matches.append((match_date, result, opponent_url))
+    return matches
+
+
+def parse_guild_members_bs4(html):
+    """
+    Разбирает страницу списка участников союза.
+    Возвращает (множество (profile_url, nickname), наибольший номер страницы из ссылок пагинации).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    members = { (f"{BASE_URL}{a['href']}", a.get_text(strip=True))
+                for a in soup.select("a[href^='/users/']") }
+    page_numbers = [int(m.group(1)) for a in soup.select("a[href*='page=']")
+                    if (m := _PAGE_PARAM_RE.search(a["href"]))]
+    return members, max(page_numbers, default=1)
+
+
+def parse_guild_members_lxml(html):
+    """То же, что parse_guild_members_bs4, но через lxml: выбираются только ссылки."""
+    members = set()
+    page_numbers = []
+    for link in _lxml_root(html).iter("a"):
+        href = link.get("href")
+        if not href:
+            continue
+        if href.startswith("/users/"):
+            members.add((f"{BASE_URL}{href}", _text(link)))
+        if "page=" in href and (m := _PAGE_PARAM_RE.search(href)):
+            page_numbers.append(int(m.group(1)))
+    return members, max(page_numbers, default=1)
+
+
+def parse_profile_lxml(html, profile_url):
+    """
+    Выборочный разбор страницы профиля через lxml с той же логикой, что
+    utils.profiles.parse_nickname и parse_power_and_gk.
+    Возвращает (nickname, power_value, gk_value).
+    """
+    root = _lxml_root(html)
+
+    nickname = None
+    for tag in ("title", "h1"):
+        element = next(root.iter(tag), None)
+        if element is not None:
+            text = _text(element)
+            if text.startswith(PROFILE_TITLE_PREFIX):
+                text = text[len(PROFILE_TITLE_PREFIX):]
+            nickname = text.split(" - ")[0].strip()
+            break
+
+    power_value = "N/A"
+    for td in root.iter("td"):
+        label = _single_string(td)
+        if label and POWER_LABEL_RE.search(label):
+            value_td = next((sibling for sibling in td.itersiblings() if sibling.tag == "td"), None)
+            if value_td is not None:
+                power_value = _text(value_td)
+            break
+
+    gk_value = "N/A"
+    try:
+        players_table = None
+        for h3 in root.iter("h3"):
+            header = _single_string(h3)
+            if header and PLAYERS_HEADER_RE.search(header):
+                following = h3.xpath("following::table[1]")
+                players_table = following[0] if following else None
+                break
+        if players_table is None:
+            for table in root.iter("table"):
+                header_row = next(table.iter("tr"), None)
+                if header_row is not None:
+                    header_text = header_row.text_content()
+                    if "Поз" in header_text and "Мас" in header_text:
+                        players_table = table
+                        break
+        if players_table is not None:
+            rows = list(players_table.iter("tr"))
+            header_cells = [cell for cell in rows[0].iter() if cell.tag in ("th", "td")] if rows else []
+            poz_index = None
+            mas_index = None
+            for i, cell in enumerate(header_cells):
+                text = _text(cell).lower()
+                if "поз" in text:
+                    poz_index = i
+                if "мас" in text:
+                    mas_index = i
+            if poz_index is not None and mas_index is not None:
+                gk_masses = []
+                for row in rows[1:]:
+                    cells = list(row.iter("td"))
+                    if len(cells) > max(poz_index, mas_index):
+                        if _text(cells[poz_index]).lower() != "gk":
+                            break
+                        try:
+                            gk_masses.append(float(_text(cells[mas_index])))
+                        except ValueError:
+                            pass
+                if gk_masses:
+                    gk_value = str(max(gk_masses))
+    except Exception as e:
+        print(f"Error extracting GK value for {profile_url}: {e}")
+    return nickname, power_value, gk_value
+
+
+def parse_history_rows(html, user_id):
+    if PARSER_BACKEND == "lxml":
+        return parse_history_rows_lxml(html, user_id)
+    return parse_history_rows_bs4(html, user_id)
+
+
+def parse_history_records(html, user_id):
+    """
+    Компактные записи страницы истории: (played_at в минутах, код результата, ссылка соперника).
+    Форма входа вместо истории (истёкшая сессия) — ValueError, а не пустая страница.
+    """
+    records = [(to_minutes(match_date), RESULT_CODES[result], opponent_url)
+               for match_date, result, opponent_url in parse_history_rows(html, user_id)]
+    if not records and "auth_name" in html:
+        raise ValueError(f"login form instead of match history for user {user_id}")
+    return records
+
+
+def parse_guild_members(html):
+    if PARSER_BACKEND == "lxml":
+        return parse_guild_members_lxml(html)
+    return parse_guild_members_bs4(html)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None and PARSE_POOL != "inline":
+            if PARSE_POOL == "process":
+                # spawn, а не fork: процесс Streamlit многопоточный
+                _executor = ProcessPoolExecutor(PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _executor = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix="parse")
+        return _executor
+
+
+def _fall_back_to_threads(broken):
+    """Заменяет сломанный пул процессов пулом потоков (один раз на процесс)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not broken:
+            return
+        _executor = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix="parse")
+    print("Parse process pool is unavailable, falling back to threads")
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_parse(func, *args):
+    """
+    Выполняет разбор func(*args) в пуле PARSE_POOL и возвращает его результат.
+    func должна быть функцией уровня модуля и возвращать компактные записи —
+    они передаются обратно в loop (для пула процессов — через pickle).
+    Если пул процессов не запускается или падает, дальше используется пул потоков.
+    """
+    executor = _get_executor()
+    with metrics.timed(f"parse:{func.__name__}"):
+        if executor is None:
+            return func(*args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            _fall_back_to_threads(executor)
+    return await async_parse(func, *args)
@@ -0,0 +1,202 @@
+import asyncio
+from collections import namedtuple
+from bs4 import BeautifulSoup
+from utils.cache import TTLCache
+from utils import metrics, parsing
+from utils.http_client import async_fetch_html
+from utils.parsing import async_parse, PLAYERS_HEADER_RE, POWER_LABEL_RE, PROFILE_TITLE_PREFIX
+from utils.scheduler import CrawlScheduler, current_scheduler
+
+# Сколько секунд считать сведения профиля (ник, сила, GK) свежими
+PROFILE_TTL = 15 * 60
+# Сколько миллисекунд ждать элементов профиля при первой загрузке и при повторе
+PROFILE_WAIT = 10000
+PROFILE_RETRY_WAIT = 2000
+
+# Сведения одной страницы профиля; ненайденные показатели равны "N/A"
+ProfileInfo = namedtuple("ProfileInfo", ["nickname", "power", "gk"])
+
+# Общий для страниц статистики и ростера кэш по URL профиля
+PROFILE_CACHE = TTLCache(PROFILE_TTL)
+
+
+def has_stats(info) -> bool:
+    return info is not None and info.power != "N/A" and info.gk != "N/A"
+
+
+def parse_nickname(soup, profile_url):
+    """Никнейм из <title> или <h1> страницы профиля; None, если заголовков нет."""
+    title_tag = soup.find("title")
+    if title_tag:
+        title_text = title_tag.get_text(strip=True)
+        # Если заголовок начинается с "Профиль участника", убираем этот префикс
+        if title_text.startswith(PROFILE_TITLE_PREFIX):
+            title_text = title_text[len(PROFILE_TITLE_PREFIX):]
+        # Разбиваем текст по разделителю " - " и берём первую часть
+        nickname = title_text.split(" - ")[0].strip()
+        return nickname
+
+    h1 = soup.find("h1")
+    if h1:
+        h1_text = h1.get_text(strip=True)
+        # Аналогично обрабатываем, если заголовок H1 имеет похожий формат
+        if h1_text.startswith(PROFILE_TITLE_PREFIX):
+            h1_text = h1_text[len(PROFILE_TITLE_PREFIX):]
+        nickname = h1_text.split(" - ")[0].strip()
+        return nickname
+    return None
+
+
+def parse_power_and_gk(soup, profile_url) -> tuple:
+    """
+    Извлекает со страницы профиля:
+      - "Сила 11 лучших"
+      - "Gk": максимальное значение из колонки "Мас" для игроков, 
+         у которых в колонке "Поз" равно "Gk". При обходе таблицы игроков 
+         итерация прекращается при встрече строки с иным значением в "Поз".
+    Возвращает кортеж (power_value, gk_value); ненайденный показатель равен "N/A".
+    """
+    # Извлечение "Сила 11 лучших"
+    power_value = "N/A"
+    power_label_td = soup.find("td", string=POWER_LABEL_RE)
+    if power_label_td:
+        next_td = power_label_td.find_next_sibling("td")
+        if next_td:
+            power_value = next_td.get_text(strip=True)
+
+    # Извлечение показателя "Gk"
+    gk_value = "N/A"
+    try:
+        players_table = None
+        # Сначала ищем заголовок h3 с текстом "Игроки команды"
+        h3_elem = soup.find("h3", string=PLAYERS_HEADER_RE)
+        if h3_elem:
+            players_table = h3_elem.find_next("table")
+        # Если через h3 не найдено, перебираем все таблицы на предмет наличия "Поз" и "Мас"
+        if not players_table:
+            for table in soup.find_all("table"):
+                header = table.find("tr")
+                if header:
+                    header_text = header.get_text()
+                    if "Поз" in header_text and "Мас" in header_text:
+                        players_table = table
+                        break
+        if players_table:
+            # Определяем индексы колонок "Поз" и "Мас" (ищем по наличию подстроки, без учета регистра)
+            header_cells = players_table.find("tr").find_all(["th", "td"])
+            poz_index = None
+            mas_index = None
+            for i, cell in enumerate(header_cells):
+                text = cell.get_text(strip=True).lower()
+                if "поз" in text:
+                    poz_index = i
+                if "мас" in text:
+                    mas_index = i
+            if poz_index is not None and mas_index is not None:
+                gk_masses = []
+                rows = players_table.find_all("tr")[1:]  # пропускаем заголовок
+                for row in rows:
+                    cells = row.find_all("td")
+                    if len(cells) > max(poz_index, mas_index):
+                        poz_text = cells[poz_index].get_text(strip=True).lower()
+                        # Если значение в "Поз" не равно "gk", прекращаем поиск
+                        if poz_text != "gk":
+                            break
+                        mas_text = cells[mas_index].get_text(strip=True)
+                        try:
+                            mass_val = float(mas_text)
+                        except:
+                            mass_val = None
+                        if mass_val is not None:
+                            gk_masses.append(mass_val)
+                if gk_masses:
+                    gk_value = str(max(gk_masses))
+    except Exception as e:
+        print(f"Error extracting GK value for {profile_url}: {e}")
+    return power_value, gk_value
+
+
+def parse_profile_page(html, profile_url) -> ProfileInfo:
+    """Разбирает страницу профиля за один проход: ник, "Сила 11 лучших" и GK."""
+    if parsing.PARSER_BACKEND == "lxml":
+        return ProfileInfo(*parsing.parse_profile_lxml(html, profile_url))
+    soup = BeautifulSoup(html, "html.parser")
+    power, gk = parse_power_and_gk(soup, profile_url)
+    return ProfileInfo(parse_nickname(soup, profile_url), power, gk)
+
+
+async def async_wait_for_profile_content(page, timeout=PROFILE_WAIT):
+    """
+    Дожидается ячейки "Сила 11 лучших" и таблицы игроков (заголовок "Игроки команды"
+    или строка с колонками "Поз" и "Мас") на странице профиля.
+    Если элемент так и не появился, разбор всё равно выполняется и вернёт "N/A".
+    """
+    players_table = page.locator("h3", has_text=PLAYERS_HEADER_RE).or_(
+        page.locator("tr", has_text="Поз").filter(has_text="Мас")
+    )
+    waits = [
+        page.locator("td", has_text=POWER_LABEL_RE).first.wait_for(timeout=timeout),
+        players_table.first.wait_for(timeout=timeout),
+    ]
+    await asyncio.gather(*waits, return_exceptions=True)
+
+
+async def async_get_profile_info(page, profile_url) -> ProfileInfo:
+    """
+    Сведения профиля для страницы статистики: из кэша, иначе одной загрузкой
+    через HTTP-сессию или вкладку. Ошибки загрузки пробрасываются.
+    """
+    info = PROFILE_CACHE.get(profile_url)
+    if info is not None:
+        metrics.incr("profile_cache_hits")
+        return info
+    metrics.incr("profile_cache_misses")
+    info = await async_parse(parse_profile_page, await async_fetch_html(page, profile_url), profile_url)
+    PROFILE_CACHE.set(profile_url, info)
+    return info
+
+
+async def async_get_profile_stats_info(context, profile_url) -> ProfileInfo:
+    """
+    Сведения профиля с обязательными "Сила 11 лучших" и GK (страница ростера).
+
+    Берутся из кэша, если там есть оба показателя; иначе профиль открывается во
+    вкладке браузера с ожиданием нужных элементов. Каждая попытка выполняется
+    в слоте текущего CrawlScheduler. Если показатель равен "N/A" (у профиля
+    может и не быть GK или силы), страница перечитывается не больше
+    RESULT_RETRIES раз с коротким ожиданием PROFILE_RETRY_WAIT, не расходуя
+    бюджет повторов и не снижая лимит запросов.
+    """
+    info = PROFILE_CACHE.get(profile_url)
+    if has_stats(info):
+        metrics.incr("profile_cache_hits")
+        return info
+    metrics.incr("profile_cache_misses")
+
+    waits = [PROFILE_WAIT]
+
+    async def attempt():
+        page = await context.new_page()
+        try:
+            with metrics.timed("goto"):
+                await page.goto(profile_url, timeout=15000, wait_until="domcontentloaded")
+            # Ждём только элементы, которые нужны парсеру, а не фиксированную паузу
+            with metrics.timed("wait_profile"):
+                await async_wait_for_profile_content(page, waits[-1])
+            waits.append(PROFILE_RETRY_WAIT)
+            with metrics.timed("content"):
+                html = await page.content()
+        finally:
+            await page.close()
+        metrics.incr("pages")
+        metrics.incr("bytes", len(html.encode("utf-8")))
+        return await async_parse(parse_profile_page, html, profile_url)
+
+    scheduler = current_scheduler.get() or CrawlScheduler()
+    try:
+        info = await scheduler.run(attempt, is_ok=has_stats)
+    except Exception as ex:
+        metrics.failure("failed_profile_pages", f"General error in async_get_profile_stats for {profile_url}: {ex}")
+        return ProfileInfo(None, "N/A", "N/A")
+    PROFILE_CACHE.set(profile_url, info)
+    return info
@@ -0,0 +1,119 @@
+import time
+from contextlib import aclosing
+from utils import metrics
+from utils.browser_pool import BROWSER_POOL
+from utils.data_processing import async_get_guild_members, async_iter_completed
+from utils.http_client import create_http_session
+from utils.profiles import async_get_profile_stats_info, has_stats
+from utils.roster_store import ROSTER_TTL, RosterEntry, RosterStore, is_fresh
+from utils.scheduler import MAX_LIMIT, CrawlScheduler, use_scheduler
+
+
+async def async_iter_roster(guild_url: str, login: str, password: str, max_age: int = ROSTER_TTL,
+                            max_requests: int = MAX_LIMIT, background: bool = False):
+    """
+    Берёт авторизованную сессию из общего BROWSER_POOL (вход через форму нужен
+    только при первом запуске или истечении сессии), переходит на страницу союза и получает:
+      - Название союза (из элемента <h3>)
+      - Список участников союза (функция async_get_guild_members возвращает кортежи (profile_url, nickname)
+        из недавно загруженного списка или через HTTP-сессию с cookies браузера)
+    Из списка исключается профиль, под которым выполнена авторизация.
+    Участники из последнего снимка RosterStore, чьи показатели загружены не
+    раньше max_age секунд назад, берутся из снимка без загрузки. Для остальных
+    (устаревших и новых в союзе) параллельно вызывается async_get_profile_stats_info
+    (из общего со страницей статистики кэша профилей или одним посещением страницы):
+      - "Сила 11 лучших"
+      - "Gk"
+      - ника, если в списке участников он пустой
+    max_age=0 обновляет всех. Количество одновременно открытых страниц подстраивает
+    CrawlScheduler по задержкам и ошибкам, не выше max_requests.
+    Выдаёт по мере готовности кортежи
+         (alliance_name, done, total, (profile_url, nickname, power_value, gk_value));
+    для союза без участников — один кортеж (alliance_name, 0, 0, None).
+    Полностью пройденный ростер сохраняется новым снимком союза; при
+    background=True (фоновое обновление) снимок помечается фоновым (см. RosterStore)
+    и не сохраняется вовсе, если ни один участник не загружался и состав не изменился.
+    """
+    with use_scheduler(CrawlScheduler(max_limit=max_requests)):
+        async with aclosing(_async_iter_roster(guild_url, login, password, max_age, background)) as roster:
+            async for item in roster:
+                yield item
+
+
+async def _async_iter_roster(guild_url: str, login: str, password: str, max_age: int, background: bool):
+    login_session = await BROWSER_POOL.acquire(login, password)
+    context = login_session.context
+    # URL залогиненного профиля для исключения
+    logged_profile_url = login_session.profile_url
+
+    page = await context.new_page()
+    try:
+        # Переход на страницу союза для получения названия союза
+        await page.goto(guild_url, timeout=30000, wait_until="domcontentloaded")
+        alliance_name = "N/A"
+        try:
+            alliance_name_el = await page.wait_for_selector("h3", timeout=15000)
+            alliance_name = (await alliance_name_el.inner_text()).strip()
+        except Exception as e:
+            print(f"Error retrieving alliance name for {guild_url}: {e}")
+
+        # Получаем список участников союза через async_get_guild_members
+        # (страницы списка загружаются по HTTP с cookies браузерной сессии)
+        async with await create_http_session(context, login_session.user_agent) as session:
+            roster = await async_get_guild_members(session, guild_url)
+        if logged_profile_url:
+            roster = [entry for entry in roster if entry[0] != logged_profile_url]
+    finally:
+        await page.close()
+
+    if not roster:
+        yield alliance_name, 0, 0, None
+        return
+
+    with RosterStore() as store:
+        previous = store.latest(guild_url)
+    previous_entries = previous.entries if previous else {}
+    started_at = int(time.time())
+    refreshed = 0
+
+    # Число одновременно открытых вкладок регулирует CrawlScheduler
+    async def member_info(profile_url, nickname):
+        nonlocal refreshed
+        cached = previous_entries.get(profile_url)
+        if is_fresh(cached, started_at, max_age):
+            metrics.incr("roster_reused")
+            return cached._replace(nickname=nickname or cached.nickname)
+        refreshed += 1
+        metrics.incr("roster_refreshed")
+        with metrics.timed_member(profile_url):
+            info = await async_get_profile_stats_info(context, profile_url)
+        if not has_stats(info) and cached is not None:
+            # Профиль не прочитался — оставляем прежние показатели со старой отметкой, чтобы повторить в следующий раз
+            return cached._replace(nickname=nickname or info.nickname or cached.nickname)
+        return RosterEntry(profile_url, nickname or info.nickname or "", info.power, info.gk, int(time.time()))
+
+    entries = []
+    tasks = (member_info(profile_url, nickname) for profile_url, nickname in roster)
+    async with aclosing(async_iter_completed(tasks)) as completed:
+        async for entry in completed:
+            entries.append(entry)
+            yield alliance_name, len(entries), len(roster), entry[:4]
+
+    if background and not refreshed and {entry.profile_url for entry in entries} == previous_entries.keys():
+        return
+    with RosterStore() as store:
+        store.save_snapshot(guild_url, alliance_name, entries, started_at, background)
+
+
+async def async_get_roster(guild_url: str, login: str, password: str, max_age: int = ROSTER_TTL,
+                           max_requests: int = MAX_LIMIT):
+    """
+    Собирает ростер целиком (см. async_iter_roster). Возвращает кортеж:
+         (alliance_name, список кортежей (profile_url, nickname, power_value, gk_value))
+    """
+    alliance_name, new_roster = "N/A", []
+    async with aclosing(async_iter_roster(guild_url, login, password, max_age, max_requests)) as roster:
+        async for alliance_name, _, _, entry in roster:
+            if entry is not None:
+                new_roster.append(entry)
+    return alliance_name, new_roster
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+from utils.match_store import DB_PATH
+
+# Сколько секунд считать силу и GK участника из последнего снимка свежими; переопределяется через GLEB_ROSTER_TTL
+ROSTER_TTL = int(os.environ.get("GLEB_ROSTER_TTL", 6 * 60 * 60))
+# Сколько последних снимков хранить для каждого союза (фоновые не в счёт)
+ROSTER_SNAPSHOTS_KEPT = 30
+
+# Участник в снимке: fetched_at — когда его профиль действительно загружался (секунды от эпохи)
+RosterEntry = namedtuple("RosterEntry", ["profile_url", "nickname", "power", "gk", "fetched_at"])
+# Снимок ростера союза целиком; entries — словарь profile_url -> RosterEntry
+RosterSnapshot = namedtuple("RosterSnapshot", ["snapshot_id", "guild_url", "alliance_name", "taken_at", "entries"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roster_snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    guild_url TEXT NOT NULL,
+    alliance_name TEXT NOT NULL,
+    taken_at INTEGER NOT NULL,
+    background INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS roster_snapshots_guild ON roster_snapshots (guild_url, taken_at);
+CREATE TABLE IF NOT EXISTS roster_entries (
+    snapshot_id INTEGER NOT NULL,
+    profile_url TEXT NOT NULL,
+    nickname TEXT NOT NULL,
+    power TEXT NOT NULL,
+    gk TEXT NOT NULL,
+    fetched_at INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, profile_url)
+) WITHOUT ROWID;
+"""
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_fresh(entry, now, ttl=ROSTER_TTL) -> bool:
+    """Можно ли взять участника из снимка без загрузки профиля: оба показателя есть и не старше ttl."""
+    return (entry is not None and entry.power != "N/A" and entry.gk != "N/A"
+            and now - entry.fetched_at < ttl)
+
+
+def roster_delta(previous, current):
+    """
+    Сравнивает два снимка (словари profile_url -> RosterEntry). Возвращает список
+    словарей по изменившимся участникам: "status" — "новый", "ушёл" или "изменился",
+    ник, сила и GK до и после и их разница, если оба значения числовые.
+    """
+    delta = []
+    for profile_url in current.keys() | previous.keys():
+        before, after = previous.get(profile_url), current.get(profile_url)
+        if before is None:
+            status = "новый"
+        elif after is None:
+            status = "ушёл"
+        elif (before.power, before.gk) != (after.power, after.gk):
+            status = "изменился"
+        else:
+            continue
+        row = {"status": status, "profile_url": profile_url, "nickname": (after or before).nickname}
+        for field in ("power", "gk"):
+            old = getattr(before, field) if before else None
+            new = getattr(after, field) if after else None
+            row[f"{field}_before"], row[f"{field}_after"] = old, new
+            old_num, new_num = _number(old), _number(new)
+            row[f"{field}_change"] = new_num - old_num if old_num is not None and new_num is not None else None
+        delta.append(row)
+    order = {"новый": 0, "ушёл": 1, "изменился": 2}
+    delta.sort(key=lambda row: (order[row["status"]], -abs(row["power_change"] or 0), row["nickname"] or ""))
+    return delta
+
+
+class RosterStore:
+    """
+    Снимки ростеров союзов в той же базе SQLite, что и MatchStore.
+
+    Каждый обход сохраняет снимок: название союза, время и всех участников с
+    силой, GK и временем загрузки профиля. Участники, взятые из предыдущего
+    снимка без загрузки, переносятся со своим старым fetched_at, так что
+    свежесть каждого участника видна независимо от времени снимка.
+
+    Снимки фонового обновления (background) служат только источником свежих
+    участников для следующего обхода: хранится лишь фоновый снимок, оказавшийся
+    последним, а в сравнение изменений и в ROSTER_SNAPSHOTS_KEPT они не входят.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(roster_snapshots)")}
+        if "background" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE roster_snapshots ADD COLUMN background INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def snapshots(self, guild_url: str, limit: int = 2, include_background: bool = True) -> list:
+        """
+        Последние limit снимков союза (RosterSnapshot), начиная с самого нового;
+        include_background=False пропускает снимки фонового обновления.
+        """
+        heads = self.conn.execute(
+            "SELECT snapshot_id, alliance_name, taken_at FROM roster_snapshots "
+            "WHERE guild_url = ? AND (? OR NOT background) ORDER BY taken_at DESC, snapshot_id DESC LIMIT ?",
+            (guild_url, include_background, limit),
+        ).fetchall()
+        result = []
+        for snapshot_id, alliance_name, taken_at in heads:
+            rows = self.conn.execute(
+                "SELECT profile_url, nickname, power, gk, fetched_at FROM roster_entries WHERE snapshot_id = ?",
+                (snapshot_id,),
+            ).fetchall()
+            entries = {row[0]: RosterEntry(*row) for row in rows}
+            result.append(RosterSnapshot(snapshot_id, guild_url, alliance_name, taken_at, entries))
+        return result
+
+    def latest(self, guild_url: str):
+        """Последний снимок союза или None."""
+        snapshots = self.snapshots(guild_url, 1)
+        return snapshots[0] if snapshots else None
+
+    def save_snapshot(self, guild_url: str, alliance_name: str, entries, taken_at: int = None,
+                      background: bool = False) -> int:
+        """
+        Сохраняет снимок из RosterEntry одной транзакцией и удаляет снимки союза
+        сверх ROSTER_SNAPSHOTS_KEPT, а также фоновые, кроме самого нового снимка.
+        Возвращает snapshot_id.
+        """
+        taken_at = int(time.time()) if taken_at is None else taken_at
+        with self.conn:
+            snapshot_id = self.conn.execute(
+                "INSERT INTO roster_snapshots (guild_url, alliance_name, taken_at, background) VALUES (?, ?, ?, ?)",
+                (guild_url, alliance_name, taken_at, background),
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO roster_entries (snapshot_id, profile_url, nickname, power, gk, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((snapshot_id, e.profile_url, e.nickname or "", e.power, e.gk, e.fetched_at) for e in entries),
+            )
+            stale = [row[0] for row in self.conn.execute(
+                "SELECT snapshot_id FROM roster_snapshots WHERE guild_url = ? AND NOT background "
+                "ORDER BY taken_at DESC, snapshot_id DESC LIMIT -1 OFFSET ?",
+                (guild_url, ROSTER_SNAPSHOTS_KEPT),
+            )]
+            latest = self.latest(guild_url)
+            stale += [row[0] for row in self.conn.execute(
+                "SELECT snapshot_id FROM roster_snapshots WHERE guild_url = ? AND background AND snapshot_id != ?",
+                (guild_url, latest.snapshot_id),
+            )]
+            for old_id in stale:
+                self.conn.execute("DELETE FROM roster_entries WHERE snapshot_id = ?", (old_id,))
+                self.conn.execute("DELETE FROM roster_snapshots WHERE snapshot_id = ?", (old_id,))
+        return snapshot_id
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+
+class AsyncRuntime:
+    """
+    Один долгоживущий event loop в фоновом потоке на весь процесс.
+
+    Все асинхронные ресурсы (браузер и контексты BROWSER_POOL, HTTP-соединения,
+    выполняющиеся обходы) живут в этом loop и переживают перезапуски скриптов
+    Streamlit. Потоки скриптов только отправляют в него корутины через submit
+    и не блокируются на время обхода; обходы разных сессий идут в нём параллельно.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """Event loop рантайма; поток с ним запускается при первом обращении."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(loop, ready), name="async-runtime", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def _run(loop, ready):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """
+        Потокобезопасно запускает корутину в loop рантайма.
+        Возвращает concurrent.futures.Future с её результатом.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+# Общий для процесса рантайм
+RUNTIME = AsyncRuntime()
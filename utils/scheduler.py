@@ -0,0 +1,194 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from utils import metrics
+
+# Границы и стартовое значение числа одновременных запросов
+INITIAL_LIMIT = 8
+MIN_LIMIT = 2
+MAX_LIMIT = 32
+# Запрос считается признаком перегрузки, если он дольше базовой задержки в LATENCY_TOLERANCE раз
+LATENCY_TOLERANCE = 2.5
+# Начальный запас повторов на один обход, его пополнение с каждого нового
+# запроса (доля) и число попыток на один запрос
+RETRY_BUDGET = 50
+RETRY_RATIO = 0.1
+MAX_ATTEMPTS = 4
+# Сколько раз повторять запрос, ответ которого отверг is_ok (сервер ответил, но
+# данных нет); такие повторы не расходуют бюджет и не влияют на лимит
+RESULT_RETRIES = 1
+# Параметры экспоненциальной паузы между попытками (секунды)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Планировщик текущего обхода; задачи asyncio наследуют его из контекста
+current_scheduler = ContextVar("current_scheduler", default=None)
+# Бюджет повторов, заменяющий бюджет планировщика (например, свой у каждого союза)
+current_retry_budget = ContextVar("current_retry_budget", default=None)
+
+
+class RetryBudget:
+    """
+    Запас повторов: retry_budget в начале плюс retry_ratio повтора за каждый
+    новый запрос. Растёт вместе с объёмом обхода, но неотвечающий сервер (где
+    новых успешных запросов нет) не получает лавину повторов.
+    """
+
+    def __init__(self, retry_budget=RETRY_BUDGET, retry_ratio=RETRY_RATIO):
+        self.retries_left = float(retry_budget)
+        self.retry_ratio = retry_ratio
+
+    def deposit(self):
+        """Учитывает новый запрос (первую попытку)."""
+        self.retries_left += self.retry_ratio
+
+    def take(self) -> bool:
+        """Забирает один повтор, если он есть."""
+        if self.retries_left < 1:
+            return False
+        self.retries_left -= 1
+        return True
+
+
+class CrawlScheduler:
+    """
+    Адаптивный ограничитель одновременных запросов в стиле AIMD.
+
+    После каждого успешного и быстрого запроса лимит растёт примерно на единицу
+    за «окно» (limit += 1 / limit); ошибка или задержка заметно выше базовой
+    уменьшают лимит вдвое — не чаще раза за базовую задержку, чтобы пачка
+    одновременных ошибок не обрушила его до минимума. Повторы идут с
+    экспоненциальной паузой со случайным разбросом и расходуют общий на обход
+    RetryBudget(retry_budget, retry_ratio), если внутри use_retry_budget не
+    задан свой: так один планировщик делит темп запросов между союзами шарда,
+    а повторы каждого союза считаются отдельно.
+
+    Лимит и бюджет меняют только сетевые и HTTP-ошибки и тайм-ауты: ответ,
+    который отверг is_ok, — не признак перегрузки; такой запрос повторяется не
+    больше result_retries раз отдельно от бюджета.
+
+    Объект создаётся на один обход внутри работающего event loop.
+    """
+
+    def __init__(self, initial_limit=INITIAL_LIMIT, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT,
+                 retry_budget=RETRY_BUDGET, retry_ratio=RETRY_RATIO, max_attempts=MAX_ATTEMPTS,
+                 result_retries=RESULT_RETRIES):
+        self.limit = float(min(initial_limit, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.retry_budget = RetryBudget(retry_budget, retry_ratio)
+        self.max_attempts = max_attempts
+        self.result_retries = result_retries
+        self.in_flight = 0
+        self.baseline_latency = None
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def _acquire(self):
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+
+    async def _release(self, latency, ok):
+        """Освобождает слот; ok=None — исход ничего не говорит о нагрузке и лимит не меняет."""
+        async with self._cond:
+            self.in_flight -= 1
+            if ok is None:
+                self._cond.notify_all()
+                return
+            congested = not ok
+            if ok:
+                if self.baseline_latency is None or latency < self.baseline_latency:
+                    self.baseline_latency = latency
+                else:
+                    # Медленно подтягиваем базу вверх, чтобы она следовала за сервером
+                    self.baseline_latency += 0.05 * (latency - self.baseline_latency)
+                congested = latency > LATENCY_TOLERANCE * self.baseline_latency
+            now = time.monotonic()
+            if congested:
+                if now - self._last_decrease > (self.baseline_latency or 1.0):
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Пауза перед повтором номер attempt (с нуля): экспонента со случайным разбросом ±50%."""
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def run(self, attempt, is_ok=None, is_retryable=None):
+        """
+        Выполняет attempt() (асинхронная функция без аргументов) в слоте планировщика
+        с повторами.
+
+        is_ok(result) -> False помечает результат как неполный: запрос повторяется
+        до result_retries раз (без бюджета и без влияния на лимит), затем
+        возвращается последний результат.
+        is_retryable(exc) -> False означает ошибку, которую повтор не исправит: она
+        пробрасывается сразу и не считается признаком перегрузки. Исключение
+        последней попытки пробрасывается вызывающему.
+        """
+        result = None
+        budget = current_retry_budget.get() or self.retry_budget
+        budget.deposit()
+        errors = 0
+        result_misses = 0
+        while True:
+            await self._acquire()
+            started = time.monotonic()
+            error = None
+            health = False
+            try:
+                result = await attempt()
+                health = True if is_ok is None or is_ok(result) else None
+            except asyncio.CancelledError:
+                # Отмена (ранний выход из обхода страниц, закрытие генератора) — не перегрузка
+                health = None
+                raise
+            except Exception as e:
+                error = e
+                if is_retryable is not None and not is_retryable(e):
+                    health = None
+            finally:
+                await self._release(time.monotonic() - started, health)
+            if health:
+                return result
+            if error is None:
+                # Сервер ответил, но без нужных данных: это не перегрузка
+                result_misses += 1
+                if result_misses > self.result_retries:
+                    return result
+                metrics.incr("result_retries")
+                continue
+            errors += 1
+            retryable = health is not None
+            if errors >= self.max_attempts or not retryable or not budget.take():
+                metrics.incr("failed_requests")
+                raise error
+            metrics.incr("retries")
+            await asyncio.sleep(self.backoff(errors - 1))
+
+
+@contextmanager
+def use_scheduler(scheduler):
+    """Делает scheduler текущим для всех загрузок внутри блока (и задач, созданных в нём)."""
+    token = current_scheduler.set(scheduler)
+    try:
+        yield scheduler
+    finally:
+        current_scheduler.reset(token)
+
+
+@contextmanager
+def use_retry_budget(budget):
+    """Повторы загрузок внутри блока (и задач, созданных в нём) расходуют budget вместо бюджета планировщика."""
+    token = current_retry_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_retry_budget.reset(token)
@@ -0,0 +1,142 @@
+import asyncio
+import multiprocessing
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import aclosing
+
+from utils import metrics
+from utils.browser_pool import BROWSER_POOL
+from utils.data_processing import async_get_profiles_from_guild, async_iter_completed, process_profile
+from utils.http_client import create_http_session
+from utils.match_store import MatchStore
+from utils.profiles import async_get_profile_stats_info
+from utils.scheduler import MAX_LIMIT, CrawlScheduler, RetryBudget, use_retry_budget, use_scheduler
+
+_USER_ID_RE = re.compile(r'/users/(\d+)')
+
+
+def shard_of(profile_url, shards):
+    """Номер шарда для профиля: по user_id, так что игрок всегда попадает в один и тот же процесс."""
+    match = _USER_ID_RE.search(profile_url)
+    key = int(match.group(1)) if match else zlib.crc32(profile_url.encode("utf-8"))
+    return key % shards
+
+
+def split_shards(members, shards):
+    """Раскладывает записи (target_url, profile_url, nickname) по shards спискам."""
+    buckets = [[] for _ in range(shards)]
+    for member in members:
+        buckets[shard_of(member[1], shards)].append(member)
+    return [bucket for bucket in buckets if bucket]
+
+
+async def async_discover_members(targets, login, password):
+    """
+    Участники всех targets в виде (members, failed): members — записи
+    (target_url, profile_url, nickname), для союза — его участники без повторов
+    по user_id, для профиля — он сам; failed — союзы, список участников которых
+    загрузить не удалось. Заодно выполняет вход, так что процессы-шарды берут
+    сессию из storage_state.
+    """
+    login_session = await BROWSER_POOL.acquire(login, password)
+    members = []
+    failed = []
+    with use_scheduler(CrawlScheduler()):
+        async with await create_http_session(login_session.context, login_session.user_agent) as session:
+            for target_url in targets:
+                if "/guilds/" not in target_url:
+                    members.append((target_url, target_url, None))
+                    continue
+                seen_ids = set()
+                try:
+                    with use_retry_budget(RetryBudget()):
+                        profiles = await async_get_profiles_from_guild(session, target_url)
+                except Exception as e:
+                    print(f"Failed to list members of {target_url}: {e}")
+                    profiles = []
+                if not profiles:
+                    failed.append(target_url)
+                for profile_url, nickname in profiles:
+                    match = _USER_ID_RE.search(profile_url)
+                    if match and match.group(1) not in seen_ids:
+                        seen_ids.add(match.group(1))
+                        members.append((target_url, profile_url, nickname))
+    return members, failed
+
+
+def crawl_shard(members, filter_from, filter_to, login, password, with_roster=True, max_requests=MAX_LIMIT):
+    """
+    Точка входа процесса-шарда: свой event loop, свой браузер, своя HTTP-сессия
+    и свой CrawlScheduler с потолком max_requests; бюджет повторов у каждого
+    target_url свой, так что сбои одного союза не лишают повторов остальные.
+    Участник, историю которого дочитать не удалось, попадает в failed, а не в
+    rows с неполной статистикой. Возвращает (rows, failed, metrics), где
+    rows — кортежи (target_url, profile_url, nickname, wins, draws, losses, power, gk),
+    failed — target_url участников, которых обойти не удалось, а metrics —
+    CrawlMetrics шарда в виде to_dict(raw=True) для слияния в координаторе.
+    """
+    return asyncio.run(_async_crawl_shard(members, filter_from, filter_to, login, password, with_roster, max_requests))
+
+
+async def _async_crawl_shard(members, filter_from, filter_to, login, password, with_roster, max_requests):
+    login_session = await BROWSER_POOL.acquire(login, password)
+    context = login_session.context
+    computed_stats = {}
+    rows = []
+    failed = []
+    budgets = {target_url: RetryBudget() for target_url, _, _ in members}
+
+    async def crawl_member(target_url, profile_url, nickname):
+        try:
+            with metrics.timed_member(profile_url), use_retry_budget(budgets[target_url]):
+                _, nickname, wins, draws, losses = await process_profile(
+                    context, profile_url, filter_from, filter_to, computed_stats, session, store, nickname)
+                info = await async_get_profile_stats_info(context, profile_url) if with_roster else None
+        except Exception as e:
+            metrics.failure("failed_profiles", f"Failed to crawl {profile_url}: {e}")
+            return target_url, None
+        return target_url, (target_url, profile_url, nickname, wins, draws, losses,
+                            info.power if info else None, info.gk if info else None)
+
+    shard_metrics = metrics.CrawlMetrics(f"Шард: {len(members)} участников")
+    with MatchStore() as store, use_scheduler(CrawlScheduler(max_limit=max_requests)), metrics.use_metrics(shard_metrics):
+        async with await create_http_session(context, login_session.user_agent) as session:
+            async with aclosing(async_iter_completed(crawl_member(*member) for member in members)) as completed:
+                async for target_url, row in completed:
+                    if row is None:
+                        failed.append(target_url)
+                    else:
+                        rows.append(row)
+    return rows, failed, shard_metrics.to_dict(raw=True)
+
+
+def run_shards(members, workers, filter_from, filter_to, login, password, with_roster=True, max_requests=MAX_LIMIT,
+               crawl_metrics=None):
+    """
+    Координатор: делит участников по user_id на workers процессов, собирает их
+    строки и возвращает (rows, failed_targets). Процессы запускаются через spawn
+    (у каждого свой Chromium); лимит запросов max_requests действует в каждом отдельно.
+    Метрики шардов сливаются в crawl_metrics, если он передан.
+    """
+    rows = []
+    failed = set()
+    shards = split_shards(members, workers)
+    if not shards:
+        return rows, failed
+    with ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(crawl_shard, shard, filter_from, filter_to, login, password,
+                                   with_roster, max_requests): shard for shard in shards}
+        for future in as_completed(futures):
+            try:
+                shard_rows, shard_failed, shard_metrics = future.result()
+            except Exception as e:
+                print(f"Shard of {len(futures[future])} members failed: {e}")
+                failed.update(member[0] for member in futures[future])
+                continue
+            rows.extend(shard_rows)
+            failed.update(shard_failed)
+            if crawl_metrics is not None:
+                crawl_metrics.merge(shard_metrics)
+    return rows, failed
+
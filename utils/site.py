@@ -0,0 +1,5 @@
+import os
+
+# Адрес сайта без завершающего "/"; переопределяется через GLEB_BASE_URL
+# (например, для локального стенда benchmarks.crawl_bench)
+BASE_URL = os.environ.get("GLEB_BASE_URL", "https://11x11.ru").rstrip("/")
@@ -0,0 +1,63 @@
+import asyncio
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+
+# Время импорта этого модуля — начало отсчёта запуска приложения
+STARTED_AT = time.perf_counter()
+# Замеры запуска и ленивых импортов: имя -> секунды
+STARTUP_TIMINGS = {}
+
+_browser_installed = None
+
+
+@contextmanager
+def timed(name):
+    """
+    Замеряет длительность блока и печатает её. В STARTUP_TIMINGS сохраняется
+    первый (холодный) замер — повторные прогоны скрипта Streamlit его не затирают.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if name not in STARTUP_TIMINGS:
+            STARTUP_TIMINGS[name] = time.perf_counter() - started
+            print(f"[startup] {name}: {STARTUP_TIMINGS[name]:.3f}s")
+
+
+def lazy_import(module_name):
+    """
+    Импортирует тяжёлый модуль (playwright, bs4, pandas и т. п. тянутся через utils)
+    при первом обращении, а не при загрузке страницы; первый импорт попадает в STARTUP_TIMINGS.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with timed(f"import {module_name}"):
+        return importlib.import_module(module_name)
+
+
+def report_startup(name="startup"):
+    """Печатает и сохраняет время от начала запуска до этого вызова (например, до первой отрисовки)."""
+    if name not in STARTUP_TIMINGS:
+        STARTUP_TIMINGS[name] = time.perf_counter() - STARTED_AT
+        print(f"[startup] {name}: {STARTUP_TIMINGS[name]:.3f}s")
+
+
+async def async_install_browser():
+    """
+    Устанавливает Chromium для Playwright, если его не нашлось при запуске браузера.
+    Вызывается только при первом обходе; установка выполняется один раз на процесс,
+    а её результат (True/False) кэшируется для всех последующих вызовов.
+    """
+    global _browser_installed
+    if _browser_installed is None:
+        with timed("playwright install chromium"):
+            process = await asyncio.create_subprocess_exec(sys.executable, "-m", "playwright", "install", "chromium")
+            returncode = await process.wait()
+        if returncode != 0:
+            print(f"playwright install chromium failed with code {returncode}")
+        _browser_installed = returncode == 0
+    return _browser_installed
@@ -0,0 +1,58 @@
+import streamlit as st
+
+# Варианты числа строк на одной странице таблицы
+PAGE_SIZES = (50, 100, 250, 500)
+# Сколько последних строк показывать, пока обход ещё идёт
+PREVIEW_ROWS = 100
+# Пункт списка сортировки «как пришло с сайта»
+NO_SORT = "—"
+
+
+def profile_link_column(label="Профиль"):
+    """Колонка со ссылкой на профиль; вместо полного URL показывается id игрока."""
+    return st.column_config.LinkColumn(label, display_text=r"/users/(\d+)")
+
+
+def query_frame(df, search="", search_column=None, sort_by=None, descending=False):
+    """
+    Фильтрует и сортирует таблицу на сервере: подстрока search (без учёта регистра)
+    в колонке search_column, затем устойчивая сортировка по sort_by; пустые значения — в конце.
+    """
+    if search and search_column:
+        df = df[df[search_column].astype(str).str.contains(search, case=False, regex=False, na=False)]
+    if sort_by:
+        df = df.sort_values(sort_by, ascending=not descending, na_position="last", kind="stable")
+    return df
+
+
+def render_preview(placeholder, df, column_config=None):
+    """Промежуточная таблица во время обхода: только последние PREVIEW_ROWS строк, без элементов управления."""
+    with placeholder.container():
+        st.dataframe(df.tail(PREVIEW_ROWS), column_config=column_config, hide_index=True)
+        if len(df) > PREVIEW_ROWS:
+            st.caption(f"Показаны последние {PREVIEW_ROWS} из {len(df)} — вся таблица появится после обхода")
+
+
+def render_table(df, key, column_config=None, search_column="Игрок"):
+    """
+    Таблица st.dataframe с поиском, сортировкой и постраничным выводом на сервере:
+    в браузер уходит только текущая страница, поэтому объём и время отрисовки не
+    растут с размером союза. key различает элементы управления разных таблиц.
+    """
+    controls = st.columns([3, 2, 1, 1, 1])
+    search = controls[0].text_input("Поиск по нику", key=f"{key}_search") if search_column else ""
+    sort_by = controls[1].selectbox("Сортировать по", (NO_SORT, *df.columns), key=f"{key}_sort")
+    descending = controls[2].toggle("По убыванию", value=True, key=f"{key}_desc")
+    page_size = controls[3].selectbox("Строк", PAGE_SIZES, key=f"{key}_page_size")
+
+    view = query_frame(df, search, search_column, None if sort_by == NO_SORT else sort_by, descending)
+    pages = max(1, -(-len(view) // page_size))
+    # После сужения фильтра номер страницы мог оказаться за концом таблицы
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = controls[4].number_input("Страница", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    start = (page - 1) * page_size
+    st.dataframe(view.iloc[start:start + page_size], column_config=column_config, hide_index=True)
+    st.caption(f"Строки {min(start + 1, len(view))}–{min(start + page_size, len(view))} из {len(view)}"
+               + (f" (всего {len(df)})" if len(view) != len(df) else ""))
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import threading
+from contextlib import aclosing
+from datetime import datetime, timedelta
+
+from utils import metrics
+from utils.browser_pool import BROWSER_POOL
+from utils.data_processing import (
+    HISTORY_MAX_AGE, async_collect_stats_for_profile, async_get_guild_members, async_iter_completed,
+)
+from utils.http_client import create_http_session
+from utils.jobs import JOB_QUEUE
+from utils.match_store import MatchStore
+from utils.profiles import async_get_profile_stats_info
+from utils.roster import async_iter_roster
+from utils.runtime import RUNTIME
+from utils.scheduler import CrawlScheduler, use_scheduler
+from utils.site import BASE_URL
+
+# Союзы и профили, данные которых держатся свежими; URL через запятую в GLEB_WATCH_LIST
+WATCH_LIST = [url.strip() for url in os.environ.get("GLEB_WATCH_LIST", f"{BASE_URL}/guilds/139").split(",")
+              if url.strip()]
+# Пауза между циклами обновления, секунды
+WARM_INTERVAL = int(os.environ.get("GLEB_WARM_INTERVAL", 15 * 60))
+# Потолок одновременных запросов фонового обновления
+WARM_CONCURRENCY = int(os.environ.get("GLEB_WARM_CONCURRENCY", "2"))
+# За сколько последних дней дочитывается история игроков
+WARM_HISTORY_DAYS = int(os.environ.get("GLEB_WARM_HISTORY_DAYS", "7"))
+# Как часто (секунды) проверять, закончились ли интерактивные обходы
+QUIET_POLL = 5
+
+
+class WarmCacheRefresher:
+    """
+    Фоновое обновление союзов и профилей из watch_list в loop RUNTIME.
+
+    Раз в interval секунд для каждого союза заново загружается список участников
+    (async_get_guild_members, в GUILD_MEMBERS_CACHE), дочитывается история матчей
+    участников за последние WARM_HISTORY_DAYS дней (в MatchStore, с отметкой о
+    чтении первой страницы) и обновляется фоновый снимок ростера (RosterStore,
+    только устаревшие участники; в сравнение изменений на странице ростера он не входит);
+    для профиля — его история и сведения профиля. Работа идёт с потолком
+    concurrency запросов и только в тишине: пока в JOB_QUEUE есть незавершённые
+    обходы, новые загрузки не начинаются. Интерактивные запросы в пределах
+    HISTORY_MAX_AGE отвечают по этим данным, а на сайт идут лишь за тем, чего нет.
+    """
+
+    def __init__(self, watch_list=WATCH_LIST, interval=WARM_INTERVAL, concurrency=WARM_CONCURRENCY,
+                 runtime=RUNTIME, jobs=JOB_QUEUE):
+        self.watch_list = list(watch_list)
+        self.interval = interval
+        self.concurrency = concurrency
+        # URL -> время последнего успешного обновления
+        self.refreshed_at = {}
+        self._runtime = runtime
+        self._jobs = jobs
+        self._credentials = None
+        self._future = None
+        self._lock = threading.Lock()
+
+    def start(self, login, password):
+        """Запускает фоновый цикл (один на процесс); повторный вызов лишь обновляет учётные данные."""
+        with self._lock:
+            self._credentials = (login, password)
+            if self._future is None and self.watch_list:
+                self._future = self._runtime.submit(self._async_loop())
+
+    def stop(self):
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+                self._future = None
+
+    async def _async_wait_quiet(self):
+        while self._jobs.running():
+            await asyncio.sleep(QUIET_POLL)
+
+    async def _async_loop(self):
+        while True:
+            await self._async_wait_quiet()
+            await self.async_refresh_all()
+            await asyncio.sleep(self.interval)
+
+    async def async_refresh_all(self):
+        """Один цикл обновления всего watch_list; метрики цикла дописываются в METRICS_LOG."""
+        login, password = self._credentials
+        crawl_metrics = metrics.CrawlMetrics(f"warm {len(self.watch_list)} targets")
+        with metrics.use_metrics(crawl_metrics):
+            for target_url in self.watch_list:
+                try:
+                    await self._async_refresh_target(target_url, login, password)
+                except Exception as e:
+                    print(f"Failed to warm {target_url}: {e}")
+                    continue
+                self.refreshed_at[target_url] = datetime.now()
+        crawl_metrics.finish()
+        crawl_metrics.export()
+
+    async def _async_refresh_target(self, target_url, login, password):
+        login_session = await BROWSER_POOL.acquire(login, password)
+        context = login_session.context
+        filter_to = datetime.now()
+        filter_from = filter_to - timedelta(days=WARM_HISTORY_DAYS)
+        is_guild = "/guilds/" in target_url
+        scheduler = CrawlScheduler(initial_limit=self.concurrency, min_limit=1, max_limit=self.concurrency)
+        with MatchStore(background=True) as store, use_scheduler(scheduler):
+            async with await create_http_session(context, login_session.user_agent) as session:
+                if is_guild:
+                    members = await async_get_guild_members(session, target_url, refresh=True)
+                else:
+                    members = [(target_url, None)]
+                slots = asyncio.Semaphore(self.concurrency)
+                computed_stats = {}
+
+                async def warm_member(profile_url):
+                    async with slots:
+                        await self._async_wait_quiet()
+                        try:
+                            with metrics.timed_member(profile_url):
+                                # Первая страница перечитывается, когда прошла половина срока свежести
+                                await async_collect_stats_for_profile(session, profile_url, filter_from, filter_to,
+                                                                      computed_stats, store, HISTORY_MAX_AGE // 2)
+                        except Exception as e:
+                            print(f"Failed to warm {profile_url}: {e}")
+
+                async with aclosing(async_iter_completed(warm_member(url) for url, _ in members)) as completed:
+                    async for _ in completed:
+                        pass
+            if not is_guild:
+                await async_get_profile_stats_info(context, target_url)
+        if is_guild:
+            await self._async_wait_quiet()
+            async with aclosing(async_iter_roster(target_url, login, password, max_requests=self.concurrency,
+                                                  background=True)) as roster:
+                async for _ in roster:
+                    pass
+
+
+# Общее для процесса фоновое обновление; запускается первым интерактивным обходом
+WARM_CACHE = WarmCacheRefresher()